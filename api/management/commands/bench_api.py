@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность HTML-лент и JSON API "
+        "на данных текущей базы: запросов в секунду и размер ответа."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument(
+            "--fields", default="",
+            help="Поля ответа API, например id,text,author.",
+        )
+
+    def pairs(self):
+        post = Post.objects.select_related("author").order_by("-id").first()
+        if post is None:
+            raise CommandError("В базе нет постов.")
+        pairs = [
+            ("index", reverse("index"), "index"),
+            ("profile", reverse("profile", args=[post.author.username]),
+             f"profile:{post.author.username}"),
+        ]
+        group = Group.objects.first()
+        if group is not None:
+            pairs.append(
+                ("group", reverse("group_url", args=[group.slug]),
+                 f"group:{group.slug}")
+            )
+        return pairs
+
+    def measure(self, client, url, rounds):
+        size = len(client.get(url).content)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            client.get(url)
+        return rounds / (time.perf_counter() - started), size
+
+    def handle(self, *args, **options):
+        client = Client()
+        rounds = options["requests"]
+        query = f"?fields={options['fields']}" if options["fields"] else ""
+        for name, html_url, feed_id in self.pairs():
+            api_url = reverse("api:feed", args=[feed_id]) + query
+            for kind, url in (("html", html_url), ("api", api_url)):
+                rate, size = self.measure(client, url, rounds)
+                self.stdout.write(
+                    f"{name:<8} {kind:<5} {rate:8.1f} запр/с "
+                    f"{size:8d} байт"
+                )
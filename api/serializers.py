@@ -0,0 +1,92 @@
+"""
+Сериализация строк values() в словари ответа API без создания моделей.
+
+Автор и сообщество отдаются как username и slug. Их имена подтягиваются
+одним запросом на всю порцию строк, а не соединением таблиц: посты
+и комментарии могут лежать в шардах, где нет таблиц пользователей.
+"""
+from django.core.files.storage import default_storage
+
+from posts.models import Group, User
+
+# Имя поля в API -> колонка values().
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "text_html": "text_html",
+    "excerpt_html": "excerpt_html",
+    "pub_date": "pub_date",
+    "author": "author_id",
+    "group": "group_id",
+    "image": "image",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "post": "post_id",
+    "text": "text",
+    "text_html": "text_html",
+    "created": "created",
+    "author": "author_id",
+}
+
+# Поля-ссылки: модель и ее колонка, которая отдается вместо id.
+RELATED = {
+    "author": (User, "username"),
+    "group": (Group, "slug"),
+}
+
+
+def parse_fields(param, available):
+    """
+    Поля из ?fields=id,text,author в порядке запроса. Без параметра -
+    все поля. Неизвестное поле - ValueError.
+    """
+    if not param:
+        return list(available)
+    fields = list(dict.fromkeys(
+        field.strip() for field in param.split(",") if field.strip()
+    ))
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ValueError(
+            "Неизвестные поля: {}. Доступны: {}.".format(
+                ", ".join(unknown) or "-", ", ".join(available)
+            )
+        )
+    return fields
+
+
+def columns(fields, available, *required):
+    """ Колонки для values(): выбранные поля и обязательные (курсор). """
+    return list(dict.fromkeys(
+        [available[field] for field in fields] + list(required)
+    ))
+
+
+def _related_names(rows, fields, available):
+    names = {}
+    for field, (model, name) in RELATED.items():
+        if field not in fields:
+            continue
+        ids = {row[available[field]] for row in rows} - {None}
+        names[field] = dict(
+            model.objects.filter(pk__in=ids).values_list("pk", name)
+        )
+    return names
+
+
+def serialize(rows, fields, available):
+    """ Словари с полями fields из строк values(). """
+    names = _related_names(rows, fields, available)
+    items = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            value = row[available[field]]
+            if field in names:
+                value = names[field].get(value)
+            elif field == "image":
+                value = default_storage.url(value) if value else None
+            item[field] = value
+        items.append(item)
+    return items
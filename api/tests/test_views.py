@@ -0,0 +1,168 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import feeds
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.base import FeedTestCase
+
+
+class FeedApiTests(FeedTestCase):
+    author_name = "api-author"
+    reader_name = "api-reader"
+    group_title = "API"
+    group_slug = "api-group"
+    post_count = 25
+
+    def walk(self, feed_id, **params):
+        """ Проходит ленту курсором до конца, возвращает все записи. """
+        url = reverse("api:feed", args=[feed_id])
+        results, cursor = [], None
+        while True:
+            query = dict(params, **({"cursor": cursor} if cursor else {}))
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            results += data["results"]
+            cursor = data["next"]
+            if cursor is None:
+                return results
+
+    def test_cursor_walks_whole_feed_once(self):
+        results = self.walk("index", limit=10)
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual([item["id"] for item in results], expected)
+
+    def test_sparse_fields(self):
+        response = self.client.get(
+            reverse("api:feed", args=["group:api-group"]),
+            {"fields": "id,author,group", "limit": 1},
+        )
+        item = response.json()["results"][0]
+        self.assertEqual(
+            item,
+            {"id": self.posts[-1].id, "author": "api-author",
+             "group": "api-group"},
+        )
+
+    def test_related_names_are_fetched_in_bulk(self):
+        # Автор ленты, посты, имена авторов и сообществ - при любом limit;
+        # список удаленных авторов уже в кеше.
+        feeds.hidden_authors()
+        with self.assertNumQueries(4):
+            self.client.get(
+                reverse("api:feed", args=["profile:api-author"]),
+                {"fields": "id,author,group", "limit": 20},
+            )
+
+    def test_unknown_field_and_bad_cursor(self):
+        url = reverse("api:feed", args=["index"])
+        self.assertEqual(
+            self.client.get(url, {"fields": "id,password"}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(url, {"cursor": "oops"}).status_code, 400
+        )
+
+    def test_out_of_range_cursor(self):
+        """ Курсор с датой вне диапазона - ошибка 400, а не 500. """
+        cursor = "99999999999999999999-1"
+        for url in (reverse("api:feed", args=["index"]),
+                    reverse("api:comments", args=[self.posts[0].id])):
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.json())
+
+    def test_follow_feed(self):
+        url = reverse("api:feed", args=["follow"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response["Content-Type"], "application/json")
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        self.assertEqual(len(self.walk("follow")), 25)
+
+    def test_post_and_comments(self):
+        post = self.posts[0]
+        for number in range(3):
+            Comment.objects.create(
+                post=post, author=self.reader, text=f"Комментарий {number}"
+            )
+        response = self.client.get(
+            reverse("api:post", args=[post.id]), {"fields": "text"}
+        )
+        self.assertEqual(response.json(), {"text": "Пост 0"})
+        response = self.client.get(
+            reverse("api:comments", args=[post.id]),
+            {"fields": "text,author", "limit": 2},
+        )
+        data = response.json()
+        self.assertEqual(
+            [item["text"] for item in data["results"]],
+            ["Комментарий 0", "Комментарий 1"],
+        )
+        response = self.client.get(
+            reverse("api:comments", args=[post.id]),
+            {"fields": "text", "cursor": data["next"]},
+        )
+        self.assertEqual(
+            response.json()["results"], [{"text": "Комментарий 2"}]
+        )
+        self.assertEqual(
+            self.client.get(reverse("api:post", args=[0])).status_code, 404
+        )
+
+
+class PostsBatchApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title="Пакет", slug="batch")
+        self.posts = []
+        for number in range(5):
+            author = User.objects.create_user(username=f"batch-{number}")
+            post = Post.objects.create(
+                text=f"Пост {number}", author=author, group=self.group
+            )
+            Comment.objects.bulk_create(
+                Comment(post=post, author=author, text="Комментарий")
+                for _ in range(number)
+            )
+            self.posts.append(post)
+
+    def test_posts_in_requested_order_with_missing_ids(self):
+        ids = [self.posts[3].id, 0, self.posts[1].id, self.posts[3].id]
+        response = self.client.get(
+            reverse("api:posts_batch"),
+            {"ids": ",".join(map(str, ids)),
+             "fields": "id,author,comment_count"},
+        )
+        self.assertEqual(response.json(), {
+            "results": [
+                {"id": self.posts[3].id, "author": "batch-3",
+                 "comment_count": 3},
+                {"id": self.posts[1].id, "author": "batch-1",
+                 "comment_count": 1},
+            ],
+            "missing": [0],
+        })
+
+    def test_number_of_queries_does_not_grow(self):
+        ids = ",".join(str(post.id) for post in self.posts)
+        # Посты, авторы, сообщества и число комментариев.
+        feeds.hidden_authors()
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse("api:posts_batch"), {"ids": ids}
+            )
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_bad_ids(self):
+        url = reverse("api:posts_batch")
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {"ids": "1,two"}).status_code, 400
+        )
+        too_many = ",".join(map(str, range(1, 302)))
+        self.assertEqual(
+            self.client.get(url, {"ids": too_many}).status_code, 400
+        )
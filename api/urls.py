@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("feeds/<str:feed_id>/", views.feed, name="feed"),
+    path("posts/batch/", views.posts_batch, name="posts_batch"),
+    path("posts/<int:post_id>/", views.post, name="post"),
+    path("posts/<int:post_id>/comments/", views.comments, name="comments"),
+]
@@ -0,0 +1,170 @@
+"""
+JSON API лент только для чтения.
+
+Ленты берутся из posts.feeds, как и в HTML-представлениях, и листаются
+курсором (?cursor=) по (-pub_date, -id). Поля ответа выбираются
+параметром ?fields=; из базы читаются только нужные колонки (values()),
+без создания моделей.
+"""
+import functools
+
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+
+from posts import feeds
+from posts.views import scroll_feed
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, columns,
+                          parse_fields, serialize)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_BATCH = 300
+BATCH_FIELDS = [*POST_FIELDS, "comment_count"]
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def json_api(view):
+    """ Только GET; ошибки отдаются в JSON, а не HTML-страницами. """
+    @require_GET
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404 as exc:
+            return error(str(exc) or "Не найдено.", 404)
+        except PermissionDenied:
+            return error("Нужна авторизация.", 403)
+        except ValueError as exc:
+            return error(str(exc), 400)
+    return wrapper
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("Параметр limit должен быть числом.")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def get_cursor(request):
+    cursor = request.GET.get("cursor") or None
+    if cursor is not None:
+        try:
+            feeds.decode_cursor(cursor)
+        except ValueError:
+            raise ValueError("Неверный курсор.")
+    return cursor
+
+
+def cursor_page(rows, limit, fields, available, moment):
+    """ Ответ со страницей строк; rows - на одну строку больше limit. """
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = feeds.encode_cursor(rows[-1][moment], rows[-1]["id"])
+    return JsonResponse({
+        "results": serialize(rows, fields, available),
+        "next": next_cursor,
+    })
+
+
+@json_api
+def feed(request, feed_id):
+    """
+    Лента постов: "index", "group:<slug>", "profile:<username>"
+    или "follow" (только для авторизованных).
+    """
+    fields = parse_fields(request.GET.get("fields"), POST_FIELDS)
+    limit = get_limit(request)
+    posts, _ = scroll_feed(request, feed_id)
+    posts = feeds.feed_after(posts, get_cursor(request))
+    rows = posts.values(*columns(fields, POST_FIELDS, "pub_date", "id"))
+    return cursor_page(
+        rows[:limit + 1], limit, fields, POST_FIELDS, "pub_date"
+    )
+
+
+@json_api
+def post(request, post_id):
+    fields = parse_fields(request.GET.get("fields"), POST_FIELDS)
+    rows = feeds.all_posts().filter(id=post_id).values(
+        *columns(fields, POST_FIELDS, "id")
+    )[:1]
+    if not rows:
+        raise Http404("Пост не найден.")
+    return JsonResponse(serialize(rows, fields, POST_FIELDS)[0])
+
+
+def get_ids(request):
+    """ id постов из ?ids=1,2,3 без повторов, в порядке запроса. """
+    try:
+        ids = list(dict.fromkeys(
+            int(value) for value in request.GET.get("ids", "").split(",")
+            if value.strip()
+        ))
+    except ValueError:
+        raise ValueError("Параметр ids - список чисел через запятую.")
+    if not ids:
+        raise ValueError("Не переданы id постов.")
+    if len(ids) > MAX_BATCH:
+        raise ValueError(f"Не больше {MAX_BATCH} постов за запрос.")
+    return ids
+
+
+@json_api
+def posts_batch(request):
+    """
+    Посты по списку id (закладки, уведомления) за постоянное число
+    запросов: посты, имена авторов и сообществ, число комментариев.
+    Ненайденные id перечислены в "missing".
+    """
+    fields = parse_fields(request.GET.get("fields"), BATCH_FIELDS)
+    ids = get_ids(request)
+    post_fields = [field for field in fields if field != "comment_count"]
+    rows = list(feeds.all_posts().filter(id__in=ids).values(
+        *columns(post_fields, POST_FIELDS, "id")
+    )[:len(ids)])
+    by_id = {
+        row["id"]: item
+        for row, item in zip(rows, serialize(rows, post_fields, POST_FIELDS))
+    }
+    if "comment_count" in fields:
+        counts = feeds.comment_counts_by_id(by_id)
+        for post_id, item in by_id.items():
+            item["comment_count"] = counts.get(post_id, 0)
+    return JsonResponse({
+        "results": [
+            {field: by_id[post_id][field] for field in fields}
+            for post_id in ids if post_id in by_id
+        ],
+        "missing": [post_id for post_id in ids if post_id not in by_id],
+    })
+
+
+@json_api
+def comments(request, post_id):
+    """ Комментарии к посту, от старых к новым. """
+    fields = parse_fields(request.GET.get("fields"), COMMENT_FIELDS)
+    limit = get_limit(request)
+    cursor = get_cursor(request)
+    post = feeds.find_post(post_id)
+    if post is None or post.author_id in feeds.hidden_authors():
+        raise Http404("Пост не найден.")
+    queryset = feeds.visible(post.comments.order_by("created", "id"))
+    if cursor is not None:
+        created, comment_id = feeds.decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=comment_id)
+        )
+    rows = queryset.values(*columns(fields, COMMENT_FIELDS, "created", "id"))
+    return cursor_page(
+        rows[:limit + 1], limit, fields, COMMENT_FIELDS, "created"
+    )
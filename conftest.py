@@ -0,0 +1,12 @@
+import pytest
+
+from yatube.testing import TemporaryCache
+
+
+@pytest.fixture(autouse=True, scope="session")
+def temporary_cache(django_test_environment):
+    """ pytest, как и manage.py test, не трогает кеш сервера. """
+    cache = TemporaryCache()
+    cache.enable()
+    yield
+    cache.disable()
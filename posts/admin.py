@@ -1,37 +1,296 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import models
+from django.urls import reverse
+from django.utils.html import format_html
 
-from .models import Post, Group, Comment, Follow
+from . import jobs
+from .models import BackgroundJob, Post, Group, Comment, Follow
+from .paging import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по внешнему ключу с полем автодополнения вместо списка всех
+    значений. Выборка фильтруется по id, без соединения таблиц.
+    """
+    template = "admin/posts/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = "{}__{}__exact".format(
+            field_path, field.target_field.name
+        )
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        choice_field = forms.ModelChoiceField(
+            queryset=self.field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(
+                self.field.remote_field, self.admin_site,
+                attrs={"style": "width: 100%",
+                       "onchange": "this.form.submit()"},
+            ),
+            required=False,
+        )
+        yield {
+            "selected": self.lookup_val is not None,
+            "params": [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.lookup_kwarg
+            ],
+            "widget": choice_field.widget.render(
+                self.lookup_kwarg, self.lookup_val,
+                attrs={"id": f"id_{self.lookup_kwarg}"},
+            ),
+            "clear_url": changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+        }
+
+
+def cascade_models(model):
+    """
+    Модель и все модели, строки которых удалит каскад при ее удалении.
+    """
+    found = {model}
+    pending = [model]
+    while pending:
+        for relation in pending.pop()._meta.related_objects:
+            related = relation.related_model
+            if relation.on_delete is models.CASCADE and related not in found:
+                found.add(related)
+                pending.append(related)
+    return found
+
+
+def job_message(background_job):
+    return format_html(
+        'Задача <a href="{}">{}</a> поставлена в очередь.',
+        reverse("admin:posts_backgroundjob_change", args=[background_job.pk]),
+        background_job,
+    )
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """
+    Удаление объектов с большой историей: страница подтверждения
+    не собирает связанные объекты, объект сразу скрывается, а строки
+    стирает фоновая задача (soft_delete - функция из posts.jobs).
+    """
+    soft_delete = None
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Права проверяются, как в Django: нужно право на удаление в каждой
+        админке, чьи строки удалит каскад. Но проверяются они по моделям,
+        без загрузки связанных строк, и поэтому с запасом: право нужно,
+        даже если строк этой модели у объекта нет.
+        """
+        objs = list(objs)
+        registry = self.admin_site._registry
+        perms_needed = {
+            model._meta.verbose_name
+            for model in cascade_models(self.model)
+            if model in registry
+            and not registry[model].has_delete_permission(request)
+        }
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        background_job = self.soft_delete(queryset)
+        self.message_user(request, job_message(background_job))
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Списки больших таблиц: без COUNT(*) по всей таблице, с фильтрами
+    по автодополнению и массовыми действиями в фоновых задачах
+    (posts.jobs). Стандартное удаление выбранных загружает каждый объект
+    для страницы подтверждения, поэтому его заменяет delete_in_batches.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("delete_in_batches",)
+
+    @property
+    def media(self):
+        # Скрипты select2 для AutocompleteFilter в боковой панели.
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        paginator = super().get_paginator(
+            request, queryset, per_page, orphans, allow_empty_first_page
+        )
+        # Номер страницы в админке (PAGE_VAR) считается с нуля.
+        try:
+            paginator.page_hint = int(request.GET.get(PAGE_VAR, 0)) + 1
+        except ValueError:
+            pass
+        return paginator
+
+    def run_job(self, request, name, queryset, **params):
+        background_job = jobs.enqueue(name, queryset, **params)
+        self.message_user(request, job_message(background_job))
+
+    def delete_in_batches(self, request, queryset):
+        self.run_job(request, f"delete_{self.opts.model_name}", queryset)
+    delete_in_batches.short_description = "Удалить выбранные в фоне"
+    delete_in_batches.allowed_permissions = ("delete",)
+
+
+class PostActionForm(ActionForm):
+    # Удаленное сообщество ждет задачу purge_group: переносить в него нельзя.
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.filter(is_deleted=False),
+        required=False,
+        label="Сообщество",
+    )
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
-    list_filter = ("pub_date",)
+    list_filter = (
+        "pub_date",
+        ("author", AutocompleteFilter),
+        ("group", AutocompleteFilter),
+    )
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
+    action_form = PostActionForm
+    actions = ("move_to_group", "strip_images", "delete_in_batches")
+
+    def move_to_group(self, request, queryset):
+        group_id = request.POST.get("group")
+        if not group_id:
+            self.message_user(
+                request, "Выберите сообщество для переноса.", messages.ERROR
+            )
+            return
+        self.run_job(request, "move_posts", queryset, group_id=int(group_id))
+    move_to_group.short_description = "Перенести в сообщество"
+    move_to_group.allowed_permissions = ("change",)
 
+    def strip_images(self, request, queryset):
+        self.run_job(request, "strip_images", queryset)
+    strip_images.short_description = "Удалить изображения"
+    strip_images.allowed_permissions = ("change",)
 
-class GroupAdmin(admin.ModelAdmin):
-    list_display = ("title", "slug")
+
+class GroupAdmin(SoftDeleteAdmin):
+    list_display = ("title", "slug", "is_deleted")
     search_fields = ("title",)
     empty_value_display = "-пусто-"
     prepopulated_fields = {"slug": ("title",), }
+    soft_delete = staticmethod(jobs.soft_delete_groups)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("pk", "post", "created", "author", "text",)
-    search_fields = ("post",)
-    list_filter = ("created",)
+    # Пустой кортеж, а не False: иначе список сам соединит таблицы
+    # связей, которых может не быть в базе комментариев.
+    list_select_related = ()
+    search_fields = ("text",)
+    list_filter = (
+        "created",
+        ("author", AutocompleteFilter),
+        ("post", AutocompleteFilter),
+    )
+    date_hierarchy = "created"
+    autocomplete_fields = ("author", "post")
     empty_value_display = "-пусто-"
+    actions = ("delete_in_batches", "delete_author_comments")
 
+    def delete_author_comments(self, request, queryset):
+        """ Все комментарии авторов выбранных комментариев (спам). """
+        authors = set(queryset.values_list("author_id", flat=True))
+        self.run_job(
+            request, "delete_comment",
+            Comment.objects.filter(author_id__in=authors),
+        )
+    delete_author_comments.short_description = (
+        "Удалить все комментарии их авторов"
+    )
+    delete_author_comments.allowed_permissions = ("delete",)
 
-class FollowAdmin(admin.ModelAdmin):
+    def get_queryset(self, request):
+        # Комментарии могут лежать в отдельной базе (DATABASE_SUBSYSTEMS),
+        # поэтому посты и авторы подгружаются отдельными запросами.
+        return super().get_queryset(request).prefetch_related(
+            "post", "author"
+        )
+
+
+class FollowAdmin(LargeTableAdmin):
     list_display = ("user", "author",)
-    search_fields = ("user",)
-    list_filter = ("user",)
+    list_select_related = ()
+    list_filter = (
+        ("user", AutocompleteFilter),
+        ("author", AutocompleteFilter),
+    )
+    autocomplete_fields = ("user", "author")
     empty_value_display = "-пусто-"
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            "user", "author"
+        )
+
+
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "status", "progress", "created", "finished")
+    list_filter = ("status", "name")
+    readonly_fields = (
+        "name", "model", "params", "status", "progress", "error", "created",
+        "finished",
+    )
+    exclude = ("ids", "total", "done")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress(self, obj):
+        if not obj.total:
+            return f"{obj.done}"
+        return f"{obj.done} / {obj.total} ({obj.done * 100 // obj.total}%)"
+    progress.short_description = "Прогресс"
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(BackgroundJob, BackgroundJobAdmin)
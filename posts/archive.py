@@ -0,0 +1,88 @@
+"""
+Холодный архив старых постов (POST_ARCHIVE).
+
+Посты старше AGE_DAYS дней вместе с комментариями к ним команда
+archive_posts переносит в отдельную базу, поэтому таблицы и индексы
+горячей базы не растут с возрастом сайта. Общая лента и ленты сообществ
+показывают только горячие посты. Профиль автора дочитывает архив, когда
+страница уходит глубже горячих постов, а страница поста ищет его в архиве,
+если в горячей базе поста нет. Комментарии к архивному посту пишутся
+и читаются в архиве (posts.routers.ArchiveRouter).
+"""
+import datetime as dt
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from .models import Post
+from .sharding import ScatterGatherFeed
+
+ARCHIVED_MODELS = {"posts.post", "posts.comment"}
+
+
+def archive_alias():
+    """ Псевдоним архивной базы или None, если архив выключен. """
+    alias = settings.POST_ARCHIVE["DATABASE"]
+    if alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def archive_databases():
+    """ Архивная база списком: пустой, если архив выключен. """
+    alias = archive_alias()
+    return [alias] if alias is not None else []
+
+
+def is_archived_model(model):
+    return (archive_alias() is not None
+            and model._meta.label_lower in ARCHIVED_MODELS)
+
+
+def is_archived(obj):
+    """ Прочитан ли объект из архивной базы. """
+    alias = archive_alias()
+    return alias is not None and obj._state.db == alias
+
+
+def cutoff():
+    """ Посты, опубликованные раньше этого момента, уходят в архив. """
+    return timezone.now() - dt.timedelta(
+        days=settings.POST_ARCHIVE["AGE_DAYS"]
+    )
+
+
+def find_post(post_id, author=None):
+    """ Ищет пост в архиве или возвращает None. """
+    alias = archive_alias()
+    if alias is None:
+        return None
+    posts = Post.objects.using(alias).filter(id=post_id)
+    if author is not None:
+        posts = posts.filter(author_id=author.pk)
+    return posts.first()
+
+
+class ArchiveFeed(ScatterGatherFeed):
+    """
+    Горячие посты, за которыми идут архивные. Архив читается, только
+    если горячих постов на срез не хватило или последний из них старше
+    границы архива: все архивные посты старше этой границы.
+    """
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        recent, archived = self.querysets
+        rows = list(recent[:index.stop])
+        sources = [rows]
+        if (not rows or len(rows) < index.stop
+                or self.key(rows[-1])[0] < cutoff()):
+            sources.append(list(archived[:index.stop]))
+        posts = list(islice(self._merge(sources), start, index.stop))
+        if self.prefetch:
+            prefetch_related_objects(posts, *self.prefetch)
+        return posts
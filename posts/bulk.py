@@ -0,0 +1,50 @@
+"""
+Вспомогательные функции для пакетной обработки больших таблиц.
+"""
+from contextlib import contextmanager
+
+
+def iter_batches(queryset, batch_size=500):
+    """
+    Отдает объекты выборки пачками, продвигаясь по первичному ключу.
+    В отличие от OFFSET каждая пачка читается по индексу за одно и то же
+    время, как бы глубоко ни зашел обход.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+@contextmanager
+def keep_auto_dates(*models):
+    """
+    Отключает auto_now_add на время пакетной вставки: иначе bulk_create
+    заменит переносимые даты публикации текущим временем.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now_add", False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def delete_moved(queryset):
+    """
+    Стирает перенесенные строки одним DELETE, без загрузки объектов
+    и сигналов удаления: это перенос между базами, а не удаление контента.
+    """
+    return queryset._raw_delete(queryset.db)
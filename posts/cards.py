@@ -0,0 +1,111 @@
+"""
+Компактное представление поста для лент.
+
+В кеше лент лежат не экземпляры Post (с _state, автором и сообществом),
+а кортежи только с теми полями, которые нужны карточке поста.
+Формат версионирован: при смене набора полей меняется CARD_VERSION,
+и старые записи кеша перестают читаться.
+"""
+import datetime as dt
+import hashlib
+import logging
+
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from . import feeds
+
+CARD_VERSION = 2
+
+THUMBNAIL_GEOMETRY = "960x339"
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_url(image):
+    """ Адрес миниатюры картинки поста, как в теге thumbnail шаблона. """
+    if not image:
+        return None
+    try:
+        return get_thumbnail(
+            image, THUMBNAIL_GEOMETRY, crop="center", upscale=True
+        ).url
+    except Exception:
+        logger.exception("Не удалось построить миниатюру %s", image)
+        return None
+
+
+class PostCard:
+    """ Все, что нужно шаблону post_item.html для вывода поста. """
+    __slots__ = (
+        "id", "text_html", "truncated", "pub_date", "author_username",
+        "group_slug", "group_title", "comment_count", "thumbnail_url",
+    )
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_post(cls, post, comment_count=0, full=False):
+        """
+        Карточка для ленты несет начало текста поста,
+        а с full=True (страница поста) - весь текст.
+        """
+        group = post.group
+        if group is not None and group.is_deleted:
+            # Посты удаленного сообщества еще не отвязаны задачей.
+            group = None
+        return cls(
+            post.id,
+            post.text_html if full else post.excerpt_html,
+            not full and post.is_truncated,
+            post.pub_date,
+            post.author.username,
+            group.slug if group else None,
+            group.title if group else None,
+            comment_count,
+            thumbnail_url(post.image),
+        )
+
+    def encode(self):
+        """ Кортеж для кеша. Дата хранится как метка времени. """
+        return (
+            self.id, self.text_html, self.truncated,
+            self.pub_date.timestamp(), self.author_username,
+            self.group_slug, self.group_title,
+            self.comment_count, self.thumbnail_url,
+        )
+
+    @property
+    def version(self):
+        """
+        Версия поста для кеша фрагментов: меняется при любой правке
+        поста, новом комментарии или переименовании автора и сообщества.
+        """
+        data = repr((CARD_VERSION,) + self.encode()).encode()
+        return hashlib.md5(data).hexdigest()
+
+    @classmethod
+    def decode(cls, row):
+        card = cls(*row)
+        card.pub_date = dt.datetime.fromtimestamp(row[3], tz=timezone.utc)
+        return card
+
+
+def build_cards(posts, full=False):
+    """ Строит карточки для списка постов, считая комментарии пачкой. """
+    posts = list(posts)
+    counts = feeds.comment_counts(posts)
+    return [
+        PostCard.from_post(post, counts.get(post.id, 0), full)
+        for post in posts
+    ]
+
+
+def encode_cards(cards):
+    return [card.encode() for card in cards]
+
+
+def decode_cards(rows):
+    return [PostCard.decode(row) for row in rows]
@@ -0,0 +1,192 @@
+"""
+Число постов в лентах без COUNT(*) на каждый запрос.
+
+Счетчики лент (FeedCounter) лежат в основной базе и обновляются сигналами
+при создании, удалении и переносе поста между сообществами. Счетчик
+появляется при первом чтении ленты: если по статистике SQLite (sqlite_stat1,
+собирается командой ANALYZE) постов меньше FEED_COUNTS["EXACT_LIMIT"],
+ленту считают точно и запоминают. Для больших лент без счетчика отдается
+оценка по статистике, а точные счетчики строит rebuild_feed_counters.
+Оценка только показывается: паджинатор ее не считает числом постов.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import F
+
+from . import archive, feeds, sharding
+from .models import FeedCounter, Post
+
+FeedCount = namedtuple("FeedCount", "value exact")
+
+
+def feed_names(post):
+    """ Ленты, в которых показывается пост. """
+    names = [f"profile:{post.author_id}"]
+    if archive.is_archived(post):
+        # Архивные посты показываются только в профиле.
+        return names
+    names.append("index")
+    if post.group_id:
+        names.append(f"group:{post.group_id}")
+    return names
+
+
+def adjust(names, delta):
+    """ Сдвигает существующие счетчики лент; отсутствующие не создает. """
+    FeedCounter.objects.using(DEFAULT_DB_ALIAS).filter(
+        name__in=names
+        ).update(value=F("value") + delta)
+
+
+def forget(names):
+    FeedCounter.objects.using(DEFAULT_DB_ALIAS).filter(
+        name__in=names
+        ).delete()
+
+
+def post_databases():
+    """ Базы, в которых лежат посты: шарды или основная база. """
+    return sharding.shards() or [router.db_for_read(Post)]
+
+
+def analyze(aliases):
+    """
+    Собирает статистику SQLite (sqlite_stat1), по которой оцениваются
+    ленты без счетчиков. Базы других СУБД пропускаются.
+    """
+    for alias in aliases:
+        if connections[alias].vendor == "sqlite":
+            with connections[alias].cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+
+def _table_stats(alias, column=None, model=Post):
+    """
+    Оценка из sqlite_stat1: число строк таблицы модели (по умолчанию
+    постов) или, если задан column, среднее число строк на одно значение
+    индексированной колонки.
+    """
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return None
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        # Таблицы статистики нет, пока не выполнялся ANALYZE.
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        )
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute(
+            "SELECT idx, stat FROM sqlite_stat1 WHERE tbl = %s", [table]
+        )
+        stats = dict(cursor.fetchall())
+        if not stats:
+            return None
+        if column is None:
+            return int(next(iter(stats.values())).split()[0])
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint["index"] and constraint["columns"] == [column]:
+            if name in stats:
+                return int(stats[name].split()[1])
+    return None
+
+
+def table_estimate(model, alias):
+    """ Число строк таблицы модели по статистике SQLite или None. """
+    return _table_stats(alias, model=model)
+
+
+def _estimate(aliases, column=None):
+    estimates = [_table_stats(alias, column) for alias in aliases]
+    if None in estimates:
+        return None
+    return sum(estimates)
+
+
+def _count_rows(aliases, **lookups):
+    """
+    Число строк постов, в том числе скрытых постов удаленных авторов:
+    счетчики уменьшаются, только когда строки действительно стерты.
+    """
+    return sum(
+        Post.objects.using(alias).filter(**lookups).count()
+        for alias in aliases
+    )
+
+
+def _has_hidden_posts(name):
+    """
+    Могут ли в счетчике ленты name быть скрытые посты удаленных
+    авторов, которые еще не стерла задача purge_user.
+    """
+    author_ids = feeds.hidden_authors()
+    if not author_ids:
+        return False
+    kind, _, key = name.partition(":")
+    if kind == "profile":
+        return int(key) in author_ids
+    return True
+
+
+def feed_count(name, count, estimate):
+    """
+    Число постов в ленте name: из счетчика, точным подсчетом count()
+    для небольших лент или приблизительно по статистике. Пока в ленте
+    есть скрытые посты, счетчик больше настоящего числа и считается
+    оценкой.
+    """
+    counters = FeedCounter.objects.using(DEFAULT_DB_ALIAS)
+    value = counters.filter(name=name).values_list("value", flat=True).first()
+    if value is not None:
+        return FeedCount(value, not _has_hidden_posts(name))
+    approximate = estimate()
+    if (approximate is not None
+            and approximate >= settings.FEED_COUNTS["EXACT_LIMIT"]):
+        return FeedCount(approximate, False)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        # Счетчик создается до подсчета: пост, сохраненный во время
+        # подсчета, сдвинет его через adjust(), а не потеряется.
+        counter, created = counters.get_or_create(
+            name=name, defaults={"value": 0}
+        )
+        if not created:
+            return FeedCount(counter.value, not _has_hidden_posts(name))
+        value = count()
+        counters.filter(pk=counter.pk).update(value=F("value") + value)
+    return FeedCount(value, not _has_hidden_posts(name))
+
+
+def global_count():
+    return feed_count(
+        "index",
+        lambda: _count_rows(post_databases()),
+        lambda: _estimate(post_databases()),
+    )
+
+
+def group_count(group):
+    return feed_count(
+        f"group:{group.pk}",
+        lambda: _count_rows(post_databases(), group_id=group.pk),
+        lambda: _estimate(post_databases(), "group_id"),
+    )
+
+
+def author_count(author):
+    def aliases():
+        if sharding.shards():
+            hot = [sharding.shard_for_author(author.pk)]
+        else:
+            hot = post_databases()
+        # Профиль показывает и архивные посты автора.
+        return hot + archive.archive_databases()
+
+    return feed_count(
+        f"profile:{author.pk}",
+        lambda: _count_rows(aliases(), author_id=author.pk),
+        lambda: _estimate(aliases(), "author_id"),
+    )
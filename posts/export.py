@@ -0,0 +1,126 @@
+"""
+Потоковая выгрузка сообществ, постов, комментариев и подписок
+в JSON Lines или CSV (команда export и представление export).
+
+Таблица читается по id порциями по chunk_size строк (keyset: id больше
+последнего выгруженного), каждая порция - QuerySet.iterator(). В памяти
+не бывает больше одной порции, сколько бы строк ни было в таблице,
+и ни один запрос не держит чтение открытым на всю выгрузку. Сжатие gzip
+тоже идет потоком, по мере выгрузки порций.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+
+from . import archive, sharding
+from .models import Comment, Follow, Group, Post
+
+EXPORTS = {
+    "group": (Group, ("id", "slug", "title", "description")),
+    "post": (Post, ("id", "author_id", "group_id", "text", "pub_date",
+                    "image")),
+    "comment": (Comment, ("id", "post_id", "author_id", "text", "created")),
+    "follow": (Follow, ("id", "user_id", "author_id")),
+}
+FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CHUNK_SIZE = 2000
+
+
+def _databases(model):
+    """
+    Базы для чтения строк модели: все шарды или одна база,
+    а для постов и комментариев еще и архив.
+    """
+    if sharding.is_sharded_model(model):
+        databases = sharding.shards()
+    else:
+        databases = [router.db_for_read(model)]
+    if archive.is_archived_model(model):
+        databases = databases + archive.archive_databases()
+    return databases
+
+
+def scan(model, fields, chunk_size=CHUNK_SIZE, **lookups):
+    """
+    Строки модели (словари values() с полями fields) порциями по id.
+    lookups ограничивают выборку, например author_id=...
+    """
+    for alias in _databases(model):
+        rows = model.objects.using(alias).filter(**lookups).order_by(
+            "id"
+            ).values(*fields)
+        last_id = 0
+        while True:
+            chunk = list(
+                rows.filter(id__gt=last_id)[:chunk_size].iterator(
+                    chunk_size=chunk_size
+                )
+            )
+            if not chunk:
+                break
+            yield chunk
+            last_id = chunk[-1]["id"]
+
+
+def iter_chunks(kind, chunk_size=CHUNK_SIZE):
+    """ Строки таблицы kind порциями по id. """
+    model, fields = EXPORTS[kind]
+    return scan(model, fields, chunk_size)
+
+
+class _Echo:
+    """ Файл для csv.writer, который возвращает строку, а не пишет ее. """
+
+    def write(self, value):
+        return value
+
+
+def jsonl_chunks(kind, chunks):
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(
+                {"type": kind, **row}, cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+            ) + "\n"
+            for row in chunk
+        )
+
+
+def csv_chunks(kind, chunks):
+    fields = EXPORTS[kind][1]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for chunk in chunks:
+        yield "".join(
+            writer.writerow([row[field] for field in fields])
+            for row in chunk
+        )
+
+
+def gzip_chunks(chunks):
+    """ Сжимает поток байтов в gzip по мере поступления. """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kind, fmt="jsonl", compress=False, chunk_size=CHUNK_SIZE):
+    """ Байты выгрузки таблицы kind в формате fmt. """
+    if kind not in EXPORTS:
+        raise ValueError(f"Неизвестная таблица: {kind}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    render = jsonl_chunks if fmt == "jsonl" else csv_chunks
+    chunks = (
+        text.encode() for text in render(kind, iter_chunks(kind, chunk_size))
+    )
+    return gzip_chunks(chunks) if compress else chunks
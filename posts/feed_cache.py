@@ -0,0 +1,152 @@
+"""
+Кеш лент с выдачей устаревшей копии на время пересчета
+(stale-while-revalidate) и единственным пересчетом на ключ (single-flight).
+
+Запись хранится вместе с моментом, до которого она свежая, и версией лент.
+Любой новый пост или комментарий меняет версию, и все записи становятся
+устаревшими. Устаревшую запись еще GRACE секунд отдают всем, кроме одного
+запроса, который под блокировкой пересчитывает ленту. При полном промахе
+параллельные запросы одного ключа ждут единственного вычисления.
+
+Пользователь, который только что писал (см. posts.routers), устаревшую
+копию не получает и всегда видит свою запись.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import routers
+from .cards import CARD_VERSION, build_cards, decode_cards, encode_cards
+
+FEED_VERSION_KEY = "feed-version"
+LOCK_KEY = "feed-lock:{}"
+
+# Вычисления, идущие в этом процессе: ключ -> событие готовности.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(FEED_VERSION_KEY, version, None)
+        version = cache.get(FEED_VERSION_KEY, version)
+    return version
+
+
+def bump_feed_version():
+    """ Помечает все закешированные ленты устаревшими. """
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _store(key, value, version):
+    options = settings.FEED_CACHE
+    fresh_until = time.time() + options["TIMEOUT"]
+    cache.set(
+        key, (value, fresh_until, version),
+        options["TIMEOUT"] + options["GRACE"],
+    )
+    return value
+
+
+def _recompute(key, compute, version):
+    """
+    Пересчитывает ленту, если удалось взять блокировку ключа.
+    Возвращает (True, значение) или (False, None), если ленту
+    уже пересчитывает кто-то другой.
+    """
+    lock_key = LOCK_KEY.format(key)
+    if not cache.add(lock_key, 1, settings.FEED_CACHE["LOCK_TIMEOUT"]):
+        return False, None
+    try:
+        return True, _store(key, compute(), version)
+    finally:
+        cache.delete(lock_key)
+
+
+def _wait_for(key, version):
+    """ Ждет, пока ленту пересчитает другой процесс. """
+    options = settings.FEED_CACHE
+    deadline = time.monotonic() + options["LOCK_TIMEOUT"]
+    while time.monotonic() < deadline:
+        time.sleep(options["POLL_INTERVAL"])
+        envelope = cache.get(key)
+        if envelope is not None and envelope[2] == version:
+            return True, envelope[0]
+        if not cache.get(LOCK_KEY.format(key)):
+            break
+    return False, None
+
+
+def cached_feed(key, compute):
+    """ Возвращает ленту из кеша или вычисляет ее через compute(). """
+    version = feed_version()
+    envelope = cache.get(key)
+    if envelope is not None:
+        value, fresh_until, stored_version = envelope
+        if stored_version == version and time.time() < fresh_until:
+            return value
+        if not routers.is_pinned():
+            # Устаревшую копию отдаем сразу, а пересчитывает ее
+            # только запрос, взявший блокировку.
+            done, fresh = _recompute(key, compute, version)
+            return fresh if done else value
+
+    with _inflight_lock:
+        event = _inflight.get(key)
+        leader = event is None
+        if leader:
+            event = _inflight[key] = threading.Event()
+    if not leader:
+        # В этом процессе ленту уже считают: ждем результата.
+        event.wait(settings.FEED_CACHE["LOCK_TIMEOUT"])
+        envelope = cache.get(key)
+        if envelope is not None and envelope[2] == version:
+            return envelope[0]
+        return compute()
+    try:
+        done, value = _recompute(key, compute, version)
+        if not done:
+            done, value = _wait_for(key, version)
+        if not done:
+            value = _store(key, compute(), version)
+        return value
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        event.set()
+
+
+def page_cards(page, name):
+    """
+    Карточки постов страницы паджинатора из кеша лент. Сама страница
+    остается ленивой, и при попадании в кеш посты из базы не читаются.
+    """
+    rows = cached_feed(
+        f"feed:{name}:{page.number}:v{CARD_VERSION}",
+        lambda: encode_cards(build_cards(page.object_list)),
+    )
+    return decode_cards(rows)
+
+
+def cursor_cards(posts, name, cursor, size):
+    """
+    До size + 1 карточек из posts (ленты после курсора, см.
+    feeds.feed_after): лишняя карточка показывает, что лента не кончилась.
+    В кеше лежит только первая порция общей ленты. Курсор приходит
+    из строки запроса, и ключ с ним позволил бы клиенту завести сколько
+    угодно записей кеша, а порции после курсора и так читаются по индексу.
+    С name=None (личные ленты) кеш не используется.
+    """
+    def compute():
+        return encode_cards(build_cards(posts[:size + 1]))
+
+    if name is None or cursor is not None:
+        return decode_cards(compute())
+    return decode_cards(
+        cached_feed(f"feed:{name}:first:v{CARD_VERSION}", compute)
+    )
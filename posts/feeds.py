@@ -0,0 +1,221 @@
+"""
+Выборки постов для лент. Представления получают ленты только отсюда:
+при шардировании (POST_SHARDS) общие ленты собираются со всех шардов,
+а посты одного автора читаются из его шарда. Старые посты из архива
+(POST_ARCHIVE) показываются только в профиле автора и на странице поста.
+Посты удаленных авторов, которые еще не стерла фоновая задача, в лентах
+не показываются.
+"""
+import datetime as dt
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import archive, sharding
+from .models import Comment, DeletedAuthor, Follow, Post
+
+HIDDEN_AUTHORS_KEY = "hidden-authors"
+
+
+def hidden_authors():
+    """ id удаленных авторов, чьи посты еще не стерты. """
+    author_ids = cache.get(HIDDEN_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(
+            DeletedAuthor.objects.using(DEFAULT_DB_ALIAS).values_list(
+                "author_id", flat=True
+            )
+        )
+        cache.set(HIDDEN_AUTHORS_KEY, author_ids, None)
+    return author_ids
+
+
+def forget_hidden_authors():
+    cache.delete(HIDDEN_AUTHORS_KEY)
+
+
+def visible(queryset):
+    """ Посты или комментарии без записей удаленных авторов. """
+    author_ids = hidden_authors()
+    if author_ids:
+        return queryset.exclude(author_id__in=author_ids)
+    return queryset
+
+
+def global_feed():
+    """ Все посты, от самого свежего до самого старого. """
+    aliases = sharding.shards()
+    if aliases:
+        return sharding.ScatterGatherFeed(
+            visible(Post.objects.using(alias).all()) for alias in aliases
+        )
+    return visible(Post.objects.select_related("author", "group"))
+
+
+def all_posts():
+    """
+    Все посты вместе с архивными - для поиска постов по id (API).
+    Для показа лент не подходит: архив в общую ленту не входит.
+    """
+    hot = global_feed()
+    alias = archive.archive_alias()
+    if alias is None:
+        return hot
+    querysets = (
+        hot.querysets if isinstance(hot, sharding.ScatterGatherFeed)
+        else [hot]
+    )
+    return sharding.ScatterGatherFeed(
+        querysets + [visible(Post.objects.using(alias).all())]
+    )
+
+
+def group_feed(group):
+    """ Посты сообщества. """
+    aliases = sharding.shards()
+    if aliases:
+        return sharding.ScatterGatherFeed(
+            visible(Post.objects.using(alias).filter(group_id=group.pk))
+            for alias in aliases
+        )
+    return visible(group.posts.select_related("author", "group"))
+
+
+def author_feed(author):
+    """
+    Посты автора. При шардировании читаются из одного шарда,
+    а старые посты дочитываются из архива.
+    """
+    posts = author.posts.all()
+    alias = archive.archive_alias()
+    if alias is not None:
+        return archive.ArchiveFeed([
+            posts, Post.objects.using(alias).filter(author_id=author.pk),
+        ])
+    if sharding.shards():
+        return posts.prefetch_related("author", "group")
+    return posts.select_related("author", "group")
+
+
+def follow_feed(user):
+    """ Посты авторов, на которых подписан пользователь. """
+    followed_authors = Follow.objects.filter(user=user).exclude(
+        author_id__in=hidden_authors()
+        ).values_list("author_id", flat=True)
+    aliases = sharding.shards()
+    if aliases:
+        authors_by_shard = defaultdict(list)
+        for author_id in followed_authors:
+            authors_by_shard[sharding.shard_for_author(author_id)].append(
+                author_id
+            )
+        return sharding.ScatterGatherFeed(
+            Post.objects.using(alias).filter(author_id__in=author_ids)
+            for alias, author_ids in authors_by_shard.items()
+        )
+    # Подписки могут лежать в отдельной базе: тогда подзапрос невозможен.
+    if router.db_for_read(Follow) != router.db_for_read(Post):
+        followed_authors = list(followed_authors)
+    return Post.objects.select_related(
+        "author", "group"
+        ).filter(author_id__in=followed_authors)
+
+
+def find_post(post_id, author=None):
+    """
+    Возвращает пост по id или None. С известным автором читает
+    только его шард, иначе при шардировании ищет во всех шардах.
+    Поста нет в горячей базе - ищет его в архиве.
+    """
+    if author is not None:
+        post = author.posts.filter(id=post_id).first()
+    elif sharding.shards():
+        post = sharding.find_post(post_id)
+    else:
+        post = Post.objects.filter(id=post_id).first()
+    if post is None:
+        post = archive.find_post(post_id, author)
+    return post
+
+
+def comment_counts(posts):
+    """
+    Число комментариев к каждому посту списка: по одному запросу
+    на базу, где лежат комментарии, вместо запроса на каждый пост.
+    """
+    ids_by_database = defaultdict(list)
+    for post in posts:
+        # В шарде и в архиве комментарии лежат рядом с постом.
+        database = (
+            post._state.db
+            if sharding.is_sharded_model(Comment) or archive.is_archived(post)
+            else router.db_for_read(Comment)
+        )
+        ids_by_database[database].append(post.id)
+    return _count_comments(ids_by_database)
+
+
+def comment_counts_by_id(post_ids):
+    """
+    То же по id постов, когда их база неизвестна (строки values()):
+    спрашивает все шарды и архив, по запросу на базу.
+    """
+    databases = (
+        sharding.shards() if sharding.is_sharded_model(Comment)
+        else [router.db_for_read(Comment)]
+    )
+    return _count_comments({
+        database: list(post_ids)
+        for database in databases + archive.archive_databases()
+    })
+
+
+def _count_comments(ids_by_database):
+    counts = {}
+    for database, post_ids in ids_by_database.items():
+        rows = Comment.objects.using(database).filter(
+            post_id__in=post_ids
+            ).order_by().values_list("post_id").annotate(total=Count("id"))
+        for post_id, total in rows:
+            counts[post_id] = counts.get(post_id, 0) + total
+    return counts
+
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(moment, pk):
+    """ Курсор ленты: дата (публикации) в микросекундах и id записи. """
+    micros = (moment - EPOCH) // dt.timedelta(microseconds=1)
+    return f"{micros}-{pk}"
+
+
+def decode_cursor(cursor):
+    """ (дата, id) из курсора или ValueError для испорченного курсора. """
+    micros, post_id = cursor.split("-")
+    post_id = int(post_id)
+    # id больше 64 бит база не примет и ответит OverflowError.
+    if post_id.bit_length() > 63:
+        raise ValueError(f"id вне диапазона: {post_id}")
+    try:
+        return EPOCH + dt.timedelta(microseconds=int(micros)), post_id
+    except OverflowError:
+        raise ValueError(f"Дата вне диапазона: {micros}")
+
+
+def feed_after(feed, cursor=None):
+    """
+    Посты ленты после курсора в порядке (-pub_date, -id): выборка
+    по индексу без OFFSET, сколько бы постов ни было пролистано.
+    """
+    if not isinstance(feed, sharding.ScatterGatherFeed):
+        feed = feed.order_by("-pub_date", "-id")
+    if cursor is None:
+        return feed
+    pub_date, post_id = decode_cursor(cursor)
+    return feed.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=post_id)
+    )
@@ -1,10 +1,14 @@
 from django.forms import ModelForm
 from django.utils.translation import gettext_lazy as _
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
 
 
 class PostForm(ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["group"].queryset = Group.objects.filter(is_deleted=False)
+
     class Meta:
         model = Post
         fields = ("group", "text", "image")
@@ -0,0 +1,54 @@
+"""
+Готовый HTML карточек постов.
+
+Карточка рендерится один раз и лежит в кеше под ключом с версией поста
+(см. PostCard.version), поэтому страница ленты забирает все карточки
+одним cache.get_many и рендерит только промахи. Во фрагменте нет ничего,
+что зависит от пользователя: кнопка редактирования оставлена меткой
+и заполняется для каждого запроса (см. posts.holes).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+
+FRAGMENT_KEY = "post-card:{}:{}"
+
+
+def fragment_key(card):
+    return FRAGMENT_KEY.format(card.id, card.version)
+
+
+def render_card_list(cards):
+    """
+    Рендерит карточки за один проход: шаблон берется из кеша загрузчика
+    один раз, а контекст создается один на все карточки.
+    """
+    template = get_template("post_item.html").template
+    context = Context(autoescape=True)
+    html = []
+    with context.render_context.push_state(template), \
+            context.bind_template(template):
+        for card in cards:
+            with context.push(post=card):
+                html.append(template._render(context))
+    return html
+
+
+def render_fragments(cards):
+    """ HTML карточек в порядке cards: из кеша или свежеотрендеренный. """
+    keys = [fragment_key(card) for card in cards]
+    fragments = cache.get_many(keys)
+    missing_keys = [key for key in keys if key not in fragments]
+    if missing_keys:
+        missing_cards = [
+            card for key, card in zip(keys, cards) if key not in fragments
+        ]
+        missing = dict(zip(missing_keys, render_card_list(missing_cards)))
+        cache.set_many(missing, settings.POST_FRAGMENT_TIMEOUT)
+        fragments.update(missing)
+    return [fragments[key] for key in keys]
+
+
+def render_cards(cards):
+    return "".join(render_fragments(cards))
@@ -0,0 +1,154 @@
+"""
+Групповая фиксация мелких записей (group commit).
+
+SQLite допускает только одного писателя, поэтому всплеск комментариев,
+подписок и новых постов превращается в очередь за блокировкой, где каждая
+запись платит за собственный fsync. Очередь собирает записи из параллельных
+запросов и раз в несколько миллисекунд фиксирует их одной транзакцией.
+
+Вызывающий поток ждет фиксации своей записи, поэтому сразу после возврата
+он видит собственные изменения (read-your-writes).
+
+У каждой базы своя очередь: с SPLIT_DATABASES комментарии и подписки
+пишутся в свои файлы SQLite, и транзакция пачки должна быть открыта
+именно там, куда маршрутизатор отправит запись.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Model
+
+from . import routers
+
+
+class GroupCommitQueue:
+    """ Очередь записей, которые фиксируются пачками в отдельном потоке. """
+
+    def __init__(self, max_delay=0.005, max_batch=100,
+                 using=DEFAULT_DB_ALIAS):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.using = using
+        self.batches_committed = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """ Ставит запись в очередь и возвращает Future с ее результатом. """
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        self._ensure_worker()
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """ Ставит запись в очередь и ждет фиксации транзакции. """
+        return self.submit(func, *args, **kwargs).result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._loop, name="group-commit", daemon=True
+                )
+                self._worker.start()
+
+    def _loop(self):
+        while True:
+            self._commit(self._collect())
+
+    def _collect(self):
+        """
+        Ждет первую запись и добирает остальные, пока не истечет
+        окно max_delay или не наберется max_batch записей.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    # Каждая запись в своей точке сохранения: ошибка одной
+                    # записи не откатывает остальные записи пачки.
+                    try:
+                        with transaction.atomic(using=self.using):
+                            results.append(
+                                (future, func(*args, **kwargs), None)
+                            )
+                    except Exception as exc:
+                        results.append((future, None, exc))
+        except Exception as exc:
+            connections[self.using].close()
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches_committed += 1
+        # Результаты отдаются только после фиксации всей пачки.
+        for future, result, exc in results:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+_queues = {}
+_queue_lock = threading.Lock()
+
+
+def get_queue(using=None):
+    """ Возвращает общую для процесса очередь записей в базу using. """
+    options = settings.GROUP_COMMIT
+    using = using or options.get("USING", DEFAULT_DB_ALIAS)
+    with _queue_lock:
+        if using not in _queues:
+            _queues[using] = GroupCommitQueue(
+                max_delay=options.get("MAX_DELAY", 0.005),
+                max_batch=options.get("MAX_BATCH", 100),
+                using=using,
+            )
+        return _queues[using]
+
+
+def write_alias(obj):
+    """ База, в которую маршрутизатор отправит запись объекта или модели. """
+    if isinstance(obj, Model):
+        return router.db_for_write(type(obj), instance=obj)
+    return router.db_for_write(obj)
+
+
+def run_write(func, *args, write_for=None, **kwargs):
+    """
+    Выполняет запись через очередь групповой фиксации, если она включена.
+    write_for - объект или модель записи: по нему выбирается база,
+    в которой откроется транзакция пачки.
+    Внутри уже открытой транзакции запись выполняется сразу: чужой поток
+    не увидит ее данных и будет ждать блокировку SQLite.
+    """
+    options = settings.GROUP_COMMIT
+    using = (
+        write_alias(write_for) if write_for is not None
+        else options.get("USING", DEFAULT_DB_ALIAS)
+    )
+    if not options.get("ENABLED") or connections[using].in_atomic_block:
+        return func(*args, **kwargs)
+    # Запись идет в чужом потоке, поэтому отмечаем ее в текущем запросе.
+    routers.note_write()
+    return get_queue(using).run(func, *args, **kwargs)
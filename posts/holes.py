@@ -0,0 +1,176 @@
+"""
+Дырявые страницы (hole punching): общий для всех пользователей каркас
+страницы и маленькие персональные вставки.
+
+Шаблоны не обращаются к пользователю напрямую, а оставляют метки:
+    {% hole "edit" username post_id %}  ->  <!--hole:edit username 1-->
+    {% holeblock "authenticated" %}...{% endholeblock %}
+        ->  <!--block:authenticated-->...<!--/block:authenticated-->
+HolePunchMiddleware заменяет метки в каждом HTML-ответе на результат
+заполнителя, зарегистрированного под именем метки. Поэтому каркас
+страницы одинаков для всех и может лежать в кеше (см. cache_shell):
+авторизованные читатели попадают в тот же кеш, что и анонимные.
+"""
+import functools
+import hashlib
+import re
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .feed_cache import feed_version
+from .models import Follow
+
+HOLE_RE = re.compile(r"<!--hole:(?P<name>[\w-]+)(?P<args>(?: [^ >]*)*)-->")
+BLOCK_RE = re.compile(
+    r"<!--block:(?P<name>[\w-]+)-->(?P<body>.*?)<!--/block:(?P=name)-->",
+    re.DOTALL,
+)
+SHELL_KEY = "shell:{}:{}"
+
+_holes = {}
+_blocks = {}
+
+
+def hole(name):
+    """ Регистрирует заполнитель метки: func(request, *args) -> str. """
+    def register(func):
+        _holes[name] = func
+        return func
+    return register
+
+
+def block(name):
+    """ Регистрирует заполнитель блока: func(request, body) -> str. """
+    def register(func):
+        _blocks[name] = func
+        return func
+    return register
+
+
+def hole_marker(name, *args):
+    return "<!--hole:{}{}-->".format(
+        name, "".join(" " + quote(str(arg), safe="") for arg in args)
+    )
+
+
+def block_markers(name):
+    return f"<!--block:{name}-->", f"<!--/block:{name}-->"
+
+
+def fill(content, request):
+    """ Заполняет все метки страницы для пользователя запроса. """
+    content = BLOCK_RE.sub(
+        lambda match: _blocks[match["name"]](request, match["body"]),
+        content,
+    )
+    return HOLE_RE.sub(
+        lambda match: _holes[match["name"]](
+            request, *map(unquote, match["args"].split())
+        ),
+        content,
+    )
+
+
+@block("authenticated")
+def authenticated_block(request, body):
+    return body if request.user.is_authenticated else ""
+
+
+@hole("nav")
+def nav_hole(request):
+    return render_to_string("nav.html", {"user": request.user})
+
+
+@hole("csrf")
+def csrf_hole(request):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">',
+        get_token(request),
+    )
+
+
+@hole("edit")
+def edit_hole(request, username, post_id):
+    if request.user.is_authenticated and request.user.username == username:
+        return format_html(
+            '<a class="btn btn-sm btn-info" href="{}" role="button">'
+            "Редактировать</a>",
+            reverse("post_edit", args=[username, post_id]),
+        )
+    return ""
+
+
+@hole("follow")
+def follow_hole(request, username):
+    user = request.user
+    if not user.is_authenticated or user.username == username:
+        return ""
+    following = Follow.objects.filter(
+        user=user, author__username=username
+        ).exists()
+    return render_to_string(
+        "posts/follow_button.html",
+        {"username": username, "following": following},
+    )
+
+
+class HolePunchMiddleware:
+    """
+    Заполняет метки в HTML-ответах. Стоит после CsrfViewMiddleware
+    и CachedAuthenticationMiddleware, чтобы пользователь уже был известен,
+    а выданный в метке csrf-токен попал в cookie.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not response.get("Content-Type", "").startswith("text/html"):
+            return response
+        if response.streaming:
+            # Метки не разрываются между частями потока (см. posts.streaming).
+            response.streaming_content = (
+                fill(chunk.decode(response.charset), request)
+                for chunk in response.streaming_content
+            )
+        elif b"<!--" in response.content:
+            response.content = fill(
+                response.content.decode(response.charset), request
+            )
+        return response
+
+
+def cache_shell(view):
+    """
+    Кеширует каркас страницы (HTML до заполнения меток) для GET-запросов.
+    Ключ зависит от версии лент и адреса, но не от пользователя. Включается
+    настройкой SHELL_CACHE["ENABLED"]: из каркаса в кеше не восстановить
+    контекст шаблона, поэтому по умолчанию кеш выключен.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        options = settings.SHELL_CACHE
+        if not options["ENABLED"] or request.method != "GET":
+            return view(request, *args, **kwargs)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = SHELL_KEY.format(feed_version(), path)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = view(request, *args, **kwargs)
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(
+                key, response.content.decode(response.charset),
+                options["TIMEOUT"],
+            )
+        return response
+    return wrapper
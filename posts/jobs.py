@@ -0,0 +1,299 @@
+"""
+Фоновые задачи модерации над большими выборками строк.
+
+Действие админки ставит задачу в очередь (enqueue): id строк выборки
+сохраняются в BackgroundJob списком JSON, а задача выполняется
+в отдельном потоке или, с BACKGROUND_JOBS["EAGER"], сразу. Задача
+проходит строки пачками по id (batches) и меняет каждую пачку одним
+update() или delete.
+Счетчики лент и версия кеша лент обновляются один раз на пачку,
+а прогресс записывается в задачу после каждой пачки.
+
+Сообщества и пользователи из админки удаляются так же: soft_delete_*
+сразу скрывает их и их записи, а строки стирает задача purge_*.
+
+Задачи, которые не успели выполниться (например, после перезапуска
+сервера), выполняет команда run_jobs.
+"""
+import json
+import logging
+import threading
+import traceback
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import archive, counts, feeds, sharding
+from .feed_cache import bump_feed_version
+from .models import (BackgroundJob, Comment, DeletedAuthor, Follow, Group,
+                     Post, User)
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+
+
+def job(name):
+    """ Регистрирует задачу: func(queryset, **params), отдает прогресс. """
+    def register(func):
+        _jobs[name] = func
+        return func
+    return register
+
+
+def enqueue(name, queryset, **params):
+    """ Ставит задачу name над выборкой queryset в очередь. """
+    if name not in _jobs:
+        raise ValueError(f"Неизвестная задача: {name}")
+    # Выборка читается из основной базы: реплика может отставать.
+    ids = queryset.using(router.db_for_write(queryset.model)).order_by(
+        "pk"
+        ).values_list("pk", flat=True)
+    background_job = BackgroundJob.objects.create(
+        name=name,
+        model=queryset.model._meta.label,
+        ids=json.dumps(list(ids)),
+        params=json.dumps(params),
+    )
+    if settings.BACKGROUND_JOBS["EAGER"]:
+        run(background_job.pk)
+    else:
+        transaction.on_commit(lambda: threading.Thread(
+            target=run_in_thread, args=(background_job.pk,), daemon=True,
+        ).start())
+    return background_job
+
+
+def run_in_thread(job_id):
+    try:
+        run(job_id)
+    finally:
+        connections.close_all()
+
+
+def run(job_id):
+    """ Выполняет задачу и записывает ее прогресс и результат. """
+    background_job = BackgroundJob.objects.get(pk=job_id)
+    model = apps.get_model(background_job.model)
+    rows = model._default_manager.db_manager(router.db_for_write(model))
+    ids = json.loads(background_job.ids)
+    background_job.status = BackgroundJob.RUNNING
+    background_job.done = 0
+    background_job.total = len(ids)
+    background_job.save()
+    try:
+        func = _jobs[background_job.name]
+        params = json.loads(background_job.params)
+        # Задача получает id частями, чтобы запросы ее пачек
+        # не перечисляли всю выборку.
+        size = settings.BACKGROUND_JOBS["BATCH"]
+        for start in range(0, len(ids), size):
+            queryset = rows.filter(pk__in=ids[start:start + size])
+            for processed in func(queryset, **params):
+                background_job.done += processed
+                background_job.save(update_fields=["done"])
+    except Exception:
+        logger.exception("Задача %s завершилась с ошибкой", background_job)
+        background_job.status = BackgroundJob.FAILED
+        background_job.error = traceback.format_exc()
+    else:
+        background_job.status = BackgroundJob.DONE
+    background_job.finished = timezone.now()
+    background_job.save()
+    return background_job
+
+
+def batches(queryset):
+    """ id строк выборки пачками по BACKGROUND_JOBS["BATCH"] (keyset). """
+    size = settings.BACKGROUND_JOBS["BATCH"]
+    ids = queryset.order_by("pk").values_list("pk", flat=True)
+    last_id = 0
+    while True:
+        chunk = list(ids.filter(pk__gt=last_id)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def _post_databases():
+    """ Базы, где лежат посты: шарды или основная база и архив. """
+    hot = sharding.shards() or [router.db_for_write(Post)]
+    return hot + archive.archive_databases()
+
+
+def _comment_databases():
+    if sharding.is_sharded_model(Comment):
+        hot = sharding.shards()
+    else:
+        hot = [router.db_for_write(Comment)]
+    return hot + archive.archive_databases()
+
+
+def _rows(queryset, ids):
+    """ Строки пачки в той же базе, что и выборка. """
+    return queryset.model._default_manager.db_manager(
+        queryset.db
+        ).filter(pk__in=ids)
+
+
+def _raw_delete(queryset):
+    # Удаление одним DELETE: без загрузки объектов и сигналов на каждую
+    # строку. Связанные строки и счетчики обновляет сама задача.
+    return queryset._raw_delete(queryset.db)
+
+
+@job("move_posts")
+def move_posts(queryset, group_id):
+    """ Переносит посты в сообщество group_id. """
+    for ids in batches(queryset):
+        posts = _rows(queryset, ids)
+        moved = Counter(
+            posts.exclude(group_id=group_id).values_list(
+                "group_id", flat=True
+            )
+        )
+        posts.update(group_id=group_id)
+        for old_group_id, number in moved.items():
+            if old_group_id is not None:
+                counts.adjust([f"group:{old_group_id}"], -number)
+        counts.adjust([f"group:{group_id}"], sum(moved.values()))
+        bump_feed_version()
+        yield len(ids)
+
+
+@job("strip_images")
+def strip_images(queryset):
+    """ Убирает изображения из постов и удаляет их файлы. """
+    for ids in batches(queryset):
+        posts = _rows(queryset, ids).filter(image__gt="")
+        paths = list(posts.values_list("image", flat=True))
+        posts.update(image="")
+        for path in paths:
+            default_storage.delete(path)
+        if paths:
+            bump_feed_version()
+        yield len(ids)
+
+
+@job("delete_post")
+def delete_posts(queryset):
+    """ Удаляет посты вместе с комментариями к ним. """
+    for ids in batches(queryset):
+        posts = _rows(queryset, ids)
+        removed = Counter()
+        rows = posts.values_list("author_id", "group_id")
+        for author_id, group_id in rows:
+            post = Post(author_id=author_id, group_id=group_id)
+            # Архивные посты считаются только в профиле автора.
+            post._state.db = posts.db
+            removed.update(counts.feed_names(post))
+        for database in _comment_databases():
+            _raw_delete(
+                Comment.objects.using(database).filter(post_id__in=ids)
+            )
+        _raw_delete(posts)
+        for name, number in removed.items():
+            counts.adjust([name], -number)
+        bump_feed_version()
+        yield len(ids)
+
+
+@job("delete_comment")
+def delete_comments(queryset):
+    for ids in batches(queryset):
+        _raw_delete(_rows(queryset, ids))
+        # В карточках постов - число комментариев.
+        bump_feed_version()
+        yield len(ids)
+
+
+@job("delete_follow")
+def delete_follows(queryset):
+    for ids in batches(queryset):
+        _raw_delete(_rows(queryset, ids))
+        bump_feed_version()
+        yield len(ids)
+
+
+def soft_delete_groups(queryset):
+    """
+    Удаляет сообщества: сразу скрывает их, а посты отвязывает
+    и строки удаляет задача purge_group.
+    """
+    group_ids = list(queryset.values_list("pk", flat=True))
+    Group.objects.filter(pk__in=group_ids).update(is_deleted=True)
+    bump_feed_version()
+    return enqueue("purge_group", Group.objects.filter(pk__in=group_ids))
+
+
+def soft_delete_users(queryset):
+    """
+    Удаляет пользователей: сразу скрывает их посты и комментарии
+    и закрывает вход, а строки стирает задача purge_user.
+    """
+    users = list(queryset)
+    DeletedAuthor.objects.bulk_create(
+        [DeletedAuthor(author=user) for user in users],
+        ignore_conflicts=True,
+    )
+    for user in users:
+        user.is_active = False
+        # save(), а не update(): сигнал сбросит пользователя в кеше сессий.
+        user.save(update_fields=["is_active"])
+    feeds.forget_hidden_authors()
+    bump_feed_version()
+    return enqueue(
+        "purge_user", User.objects.filter(pk__in=[user.pk for user in users])
+    )
+
+
+def _run(generator):
+    for _ in generator:
+        pass
+
+
+@job("purge_group")
+def purge_groups(queryset):
+    """ Отвязывает посты удаленных сообществ пачками и удаляет их. """
+    for group_id in list(queryset.values_list("pk", flat=True)):
+        for alias in _post_databases():
+            posts = Post.objects.using(alias).filter(group_id=group_id)
+            for ids in batches(posts):
+                _rows(posts, ids).update(group_id=None)
+                bump_feed_version()
+        # Связанных постов уже нет: каскад ничего не загружает.
+        Group.objects.filter(pk=group_id).delete()
+        counts.forget([f"group:{group_id}"])
+        yield 1
+
+
+@job("purge_user")
+def purge_users(queryset):
+    """
+    Стирает посты, комментарии и подписки удаленных пользователей
+    пачками, а затем самих пользователей.
+    """
+    for user_id in list(queryset.values_list("pk", flat=True)):
+        for alias in _post_databases():
+            _run(delete_posts(
+                Post.objects.using(alias).filter(author_id=user_id)
+            ))
+        for database in _comment_databases():
+            _run(delete_comments(
+                Comment.objects.using(database).filter(author_id=user_id)
+            ))
+        _run(delete_follows(
+            Follow.objects.using(router.db_for_write(Follow)).filter(
+                Q(user_id=user_id) | Q(author_id=user_id)
+            )
+        ))
+        for user in User.objects.filter(pk=user_id):
+            user.delete()
+        feeds.forget_hidden_authors()
+        yield 1
@@ -0,0 +1,102 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from posts import archive, counts, sharding
+from posts.bulk import delete_moved, iter_batches, keep_auto_dates
+from posts.feed_cache import bump_feed_version
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты старше POST_ARCHIVE['AGE_DAYS'] дней вместе "
+        "с комментариями в архивную базу пачками. Архивные посты "
+        "остаются в профиле автора и на своей странице, но уходят "
+        "из общей ленты и лент сообществ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        target = archive.archive_alias()
+        if target is None:
+            raise CommandError(
+                "Архивная база POST_ARCHIVE['DATABASE'] не описана "
+                "в DATABASES."
+            )
+        self.batch_size = options["batch_size"]
+        moment = archive.cutoff()
+        moved = 0
+        # Посты читаются из основной базы или шардов, не из реплик.
+        sources = sharding.shards() or [router.db_for_write(Post)]
+        for source in sources:
+            posts = Post.objects.using(source).filter(pub_date__lt=moment)
+            for batch in iter_batches(posts.only("pk"), self.batch_size):
+                moved += self.move([post.pk for post in batch], source, target)
+        counts.analyze(sources + [target])
+        self.stdout.write(self.style.SUCCESS(
+            f"В архив перенесено постов: {moved}."
+        ))
+
+    def move(self, ids, source, target):
+        """
+        Переносит пачку постов с комментариями в архив и стирает их.
+        Возвращает число перенесенных постов.
+        """
+        comment_database = (
+            source if sharding.is_sharded_model(Comment)
+            else router.db_for_write(Comment)
+        )
+        with transaction.atomic(using=source):
+            # Пачка перечитывается в транзакции переноса: правка поста,
+            # сделанная после выборки пачки, не потеряется.
+            posts = list(
+                Post.objects.using(source).select_for_update().filter(
+                    pk__in=ids
+                )
+            )
+            ids = [post.pk for post in posts]
+            # Профиль дочитывает архив: его счетчик не меняется.
+            removed = Counter(
+                name for post in posts for name in counts.feed_names(post)
+                if not name.startswith("profile:")
+            )
+            with transaction.atomic(using=target), keep_auto_dates(Post):
+                # Копия, оставшаяся от прерванного запуска, заменяется.
+                delete_moved(Post.objects.using(target).filter(pk__in=ids))
+                Post.objects.using(target).bulk_create(posts)
+            self.move_comments(ids, comment_database, target)
+            delete_moved(Post.objects.using(source).filter(pk__in=ids))
+        # Комментарий, сохраненный в отдельную базу комментариев во время
+        # переноса, догоняет свой пост.
+        self.move_comments(ids, comment_database, target)
+        for name, number in removed.items():
+            counts.adjust([name], -number)
+        bump_feed_version()
+        return len(ids)
+
+    def move_comments(self, post_ids, database, target):
+        """
+        Переносит комментарии к постам post_ids в архив. Стираются
+        только скопированные строки, а не все комментарии к постам.
+        """
+        with transaction.atomic(using=database):
+            comments = list(
+                Comment.objects.using(database).select_for_update().filter(
+                    post_id__in=post_ids
+                )
+            )
+            if not comments:
+                return
+            copied = [comment.pk for comment in comments]
+            with transaction.atomic(using=target), keep_auto_dates(Comment):
+                delete_moved(
+                    Comment.objects.using(target).filter(pk__in=copied)
+                )
+                Comment.objects.using(target).bulk_create(comments)
+            delete_moved(
+                Comment.objects.using(database).filter(pk__in=copied)
+            )
@@ -0,0 +1,72 @@
+import datetime as dt
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+from django.utils import timezone
+
+from posts.cards import PostCard
+from posts.fragments import render_card_list
+
+INCLUDE_LOOP = (
+    '{% for post in cards %}'
+    '{% include "post_item.html" with post=post %}'
+    '{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает стоимость рендера одной карточки поста: цикл "
+        "с {% include %} без кеша шаблонов и с ним против "
+        "однопроходного render_card_list."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=10)
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        number = options["cards"]
+        rounds = options["rounds"]
+        now = timezone.now()
+        cards = [
+            PostCard(
+                post_id, f"Текст поста {post_id}<br>вторая строка", False,
+                now - dt.timedelta(minutes=post_id), f"author{post_id}",
+                "group", "Сообщество", post_id % 3, None,
+            )
+            for post_id in range(1, number + 1)
+        ]
+        engine = engines["django"].engine
+        include_loop = engine.from_string(INCLUDE_LOOP)
+        # Так шаблоны загружались при DEBUG до явного кеширующего загрузчика.
+        uncached_loop = Engine(
+            dirs=engine.dirs,
+            loaders=[
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+            libraries=engine.libraries,
+        ).from_string(INCLUDE_LOOP)
+
+        def per_card(func):
+            func()
+            seconds = min(timeit.repeat(func, number=rounds, repeat=3))
+            return seconds / rounds / number * 1e6
+
+        results = {
+            "{% include %} без кеша шаблонов": per_card(
+                lambda: uncached_loop.render(Context({"cards": cards}))
+            ),
+            "{% include %} с кешем шаблонов": per_card(
+                lambda: include_loop.render(Context({"cards": cards}))
+            ),
+            "render_card_list": per_card(lambda: render_card_list(cards)),
+        }
+        fastest = results["render_card_list"]
+        for name, cost in results.items():
+            self.stdout.write(
+                f"{name:<34} {cost:8.1f} мкс/карточка "
+                f"({cost / fastest:.2f}x)"
+            )
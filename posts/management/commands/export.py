@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import CHUNK_SIZE, EXPORTS, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково выгружает сообщества, посты, комментарии и подписки "
+        "в JSON Lines или CSV (по одной таблице), при желании со сжатием "
+        "gzip. Память не растет с размером таблиц."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds", nargs="*",
+            help="Таблицы для выгрузки ({}), по умолчанию все.".format(
+                ", ".join(EXPORTS)
+            ),
+        )
+        parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--output", help="Файл выгрузки, по умолчанию stdout."
+        )
+
+    def handle(self, *args, **options):
+        kinds = options["kinds"] or list(EXPORTS)
+        unknown = set(kinds) - set(EXPORTS)
+        if unknown:
+            raise CommandError(
+                "Неизвестные таблицы: {}".format(", ".join(sorted(unknown)))
+            )
+        if options["format"] == "csv" and len(kinds) > 1:
+            raise CommandError("В CSV выгружается одна таблица за раз.")
+        output = (
+            open(options["output"], "wb") if options["output"]
+            else sys.stdout.buffer
+        )
+        try:
+            for kind in kinds:
+                # Несколько потоков gzip подряд - тоже корректный gzip.
+                for chunk in export(kind, options["format"], options["gzip"],
+                                    options["chunk_size"]):
+                    output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,237 @@
+import gzip
+import json
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import sharding
+from posts.bulk import keep_auto_dates
+from posts.counts import analyze, post_databases
+from posts.feed_cache import bump_feed_version
+from posts.models import (Comment, Follow, Group, Post, User, render_excerpt,
+                          render_text)
+
+ORDER = ("group", "post", "comment", "follow")
+
+
+class IdAllocator:
+    """
+    Выдает id новым строкам заранее: bulk_create в SQLite не возвращает
+    id, а комментарии ссылаются на только что загруженные посты.
+    Шардированным моделям id выдает общий счетчик (sharding.next_id)
+    блоками, остальным - локальный счетчик после наибольшего id таблицы,
+    поэтому другие записи в эти таблицы во время загрузки недопустимы.
+    """
+
+    def __init__(self, model, block):
+        self.model = model
+        self.block = block
+        self.next = self.last = 0
+        if not sharding.is_sharded_model(model):
+            alias = router.db_for_write(model)
+            self.next = (
+                model.objects.using(alias).aggregate(top=Max("id"))["top"]
+                or 0
+            ) + 1
+            self.last = None
+
+    def __call__(self):
+        if self.last is not None and self.next > self.last:
+            self.last = sharding.next_id(self.model, self.block)
+            self.next = self.last - self.block + 1
+        pk, self.next = self.next, self.next + 1
+        return pk
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает сообщества, посты, комментарии и подписки из файлов "
+        "JSON Lines пачками через bulk_create. Строка - объект с полем "
+        "type: group (slug, title, description), post (id, author, group, "
+        "text, pub_date, image), comment (post, author, text, created) "
+        "или follow (user, author). Авторы указываются по username "
+        "и создаются без пароля, если их нет; сообщество - по slug, "
+        "пост в комментарии - по id из файла. Посты неизвестных "
+        "сообществ и комментарии к ним пропускаются. Счетчики лент "
+        "и кеши пересчитываются один раз в конце."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Файлы .jsonl(.gz)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.buffers = defaultdict(list)
+        self.written = Counter()
+        self.skipped = Counter()
+        self.users = dict(User.objects.values_list("username", "id"))
+        self.groups = dict(Group.objects.values_list("slug", "id"))
+        # id поста в файле -> (id в базе, база поста).
+        self.posts = {}
+        self.ids = {
+            model: IdAllocator(model, self.batch_size)
+            for model in (User, Group, Post, Comment)
+        }
+        self.now = timezone.now()
+        self.password = make_password(None)
+
+        started = time.monotonic()
+        with keep_auto_dates(Post, Comment):
+            for path in options["paths"]:
+                for line_number, row in self.read(path):
+                    kind = row.get("type")
+                    if kind not in ORDER:
+                        raise CommandError(
+                            f"{path}:{line_number}: неизвестный type {kind!r}"
+                        )
+                    try:
+                        getattr(self, f"add_{kind}")(row)
+                    except KeyError as exc:
+                        raise CommandError(
+                            f"{path}:{line_number}: у {kind} нет поля {exc}"
+                        )
+            self.flush_all()
+        loaded = time.monotonic() - started
+
+        self.rebuild()
+        total = sum(self.written.values())
+        for kind, number in sorted(self.written.items()):
+            self.stdout.write(f"{kind:<8} {number:>10}")
+        for kind, number in sorted(self.skipped.items()):
+            self.stdout.write(f"пропущено {kind}: {number}")
+        self.stdout.write(
+            f"Загружено строк: {total} за {loaded:.1f} с "
+            f"({total / max(loaded, 1e-6):.0f} строк/с)"
+        )
+
+    def read(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as lines:
+            for line_number, line in enumerate(lines, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as exc:
+                        raise CommandError(f"{path}:{line_number}: {exc}")
+
+    def date(self, value):
+        moment = parse_datetime(value) if value else None
+        if moment is None:
+            return self.now
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def buffer(self, obj, alias):
+        model = type(obj)
+        buffer = self.buffers[model, alias]
+        buffer.append(obj)
+        if len(buffer) >= self.batch_size:
+            self.flush(model, alias)
+
+    def flush(self, model, alias):
+        objs = self.buffers.pop((model, alias), [])
+        if not objs:
+            return
+        with transaction.atomic(using=alias):
+            model.objects.using(alias).bulk_create(
+                objs, ignore_conflicts=model is Follow
+            )
+        self.written[model._meta.model_name] += len(objs)
+
+    def flush_all(self):
+        for model, alias in list(self.buffers):
+            self.flush(model, alias)
+
+    def user_id(self, username):
+        if username not in self.users:
+            user = User(
+                id=self.ids[User](), username=username,
+                password=self.password,
+            )
+            self.users[username] = user.id
+            self.buffer(user, router.db_for_write(User))
+        return self.users[username]
+
+    def add_group(self, row):
+        if row["slug"] in self.groups:
+            self.skipped["group"] += 1
+            return
+        group = Group(
+            id=self.ids[Group](), slug=row["slug"], title=row["title"],
+            description=row.get("description"),
+        )
+        self.groups[group.slug] = group.id
+        self.buffer(group, router.db_for_write(Group))
+
+    def add_post(self, row):
+        text = row["text"]
+        author = row["author"]
+        slug = row.get("group")
+        if slug and slug not in self.groups:
+            # Без сообщества пост попал бы не в ту ленту.
+            self.skipped["post"] += 1
+            return
+        post = Post(
+            id=self.ids[Post](),
+            author_id=self.user_id(author),
+            group_id=self.groups.get(slug),
+            text=text,
+            text_html=render_text(text),
+            excerpt_html=render_excerpt(text),
+            pub_date=self.date(row.get("pub_date")),
+            image=row.get("image") or None,
+        )
+        alias = (
+            sharding.shard_for_author(post.author_id)
+            or router.db_for_write(Post)
+        )
+        if "id" in row:
+            self.posts[row["id"]] = (post.id, alias)
+        self.buffer(post, alias)
+
+    def add_comment(self, row):
+        if row["post"] not in self.posts:
+            self.skipped["comment"] += 1
+            return
+        post_id, post_alias = self.posts[row["post"]]
+        text = row["text"]
+        comment = Comment(
+            id=self.ids[Comment](),
+            post_id=post_id,
+            author_id=self.user_id(row["author"]),
+            text=text,
+            text_html=render_text(text),
+            created=self.date(row.get("created")),
+        )
+        # В шарде комментарий лежит рядом с постом.
+        alias = (
+            post_alias if sharding.is_sharded_model(Comment)
+            else router.db_for_write(Comment)
+        )
+        self.buffer(comment, alias)
+
+    def add_follow(self, row):
+        user_id = self.user_id(row["user"])
+        author_id = self.user_id(row["author"])
+        if user_id == author_id:
+            self.skipped["follow"] += 1
+            return
+        self.buffer(
+            Follow(user_id=user_id, author_id=author_id),
+            router.db_for_write(Follow),
+        )
+
+    def rebuild(self):
+        """ Производные данные, которые bulk_create не обновляет. """
+        call_command("rebuild_feed_counters", stdout=self.stdout)
+        analyze(post_databases())
+        bump_feed_version()
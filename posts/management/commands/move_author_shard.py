@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import sharding
+from posts.bulk import delete_moved, iter_batches, keep_auto_dates
+from posts.models import Comment, Post, User
+
+
+def _row(obj):
+    return [getattr(obj, field.attname) for field in obj._meta.concrete_fields]
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты автора и комментарии к ним в другой шард, "
+        "не останавливая запись и чтение."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Автор, которого переносим.")
+        parser.add_argument("alias", help="Псевдоним шарда назначения.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        target = options["alias"]
+        self.batch_size = options["batch_size"]
+        if target not in sharding.shards():
+            raise CommandError(f"Шард {target} не описан в POST_SHARDS.")
+        author = User.objects.filter(username=options["username"]).first()
+        if author is None:
+            raise CommandError(f"Автор {options['username']} не найден.")
+        source = sharding.shard_for_author(author.pk)
+        if source == target:
+            self.stdout.write(f"Автор уже живет в шарде {target}.")
+            return
+
+        # Первый проход: пока сайт читает и пишет в старый шард,
+        # копируем в новый все, что там уже есть.
+        copied_posts = self.sync(Post, author, source, target)
+        copied_comments = self.sync(Comment, author, source, target)
+        # Переключаем автора: новые посты и комментарии идут в новый шард.
+        sharding.assign_shard(author.pk, target)
+        # Догоняющий проход: забираем то, что успело измениться
+        # в старом шарде за время копирования.
+        self.sync(Post, author, source, target)
+        self.sync(Comment, author, source, target)
+        self.drop_vanished(Post, copied_posts, author, source, target)
+        self.drop_vanished(Comment, copied_comments, author, source, target)
+        self.purge(author, source, target)
+        self.stdout.write(self.style.SUCCESS(
+            f"Автор {author.username} перенесен из {source} в {target}."
+        ))
+
+    def rows(self, model, author, database):
+        if model is Post:
+            return Post.objects.using(database).filter(author_id=author.pk)
+        return Comment.objects.using(database).filter(
+            post__author_id=author.pk
+        )
+
+    def sync(self, model, author, source, target):
+        """
+        Копирует недостающие и изменившиеся строки в новый шард.
+        Возвращает множество id, найденных в старом шарде.
+        """
+        seen = set()
+        batches = iter_batches(
+            self.rows(model, author, source), self.batch_size
+        )
+        for batch in batches:
+            seen.update(obj.pk for obj in batch)
+            self.copy(model, batch, target)
+        return seen
+
+    def copy(self, model, batch, target):
+        """
+        Записывает пачку строк старого шарда в новый шард. Изменившиеся
+        строки обновляются через bulk_update: сигналы сохранения уже
+        сработали при правке в старом шарде, и повторно сдвигать
+        счетчики лент нельзя.
+        """
+        existing = model.objects.using(target).in_bulk(
+            [obj.pk for obj in batch]
+        )
+        missing = [obj for obj in batch if obj.pk not in existing]
+        changed = [
+            obj for obj in batch
+            if obj.pk in existing and _row(obj) != _row(existing[obj.pk])
+        ]
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        with transaction.atomic(using=target), keep_auto_dates(model):
+            model.objects.using(target).bulk_create(missing)
+            if changed:
+                model.objects.using(target).bulk_update(changed, fields)
+
+    def drop_vanished(self, model, copied, author, source, target):
+        """ Удаляет из нового шарда строки, удаленные во время переноса. """
+        remaining = set(
+            self.rows(model, author, source).values_list("pk", flat=True)
+        )
+        vanished = list(copied - remaining)
+        for start in range(0, len(vanished), self.batch_size):
+            ids = vanished[start:start + self.batch_size]
+            delete_moved(model.objects.using(target).filter(pk__in=ids))
+
+    def purge(self, author, source, target):
+        """
+        Удаляет перенесенные строки из старого шарда пачками. Перед
+        удалением пачка еще раз копируется в новый шард, а стираются
+        только строки, которые в нем нашлись: запись, попавшая в старый
+        шард после догоняющего прохода, не пропадет.
+        """
+        for model in (Comment, Post):
+            batches = iter_batches(
+                self.rows(model, author, source), self.batch_size
+            )
+            for batch in batches:
+                self.copy(model, batch, target)
+                copied = list(model.objects.using(target).filter(
+                    pk__in=[obj.pk for obj in batch]
+                    ).values_list("pk", flat=True))
+                delete_moved(
+                    model.objects.using(source).filter(pk__in=copied)
+                )
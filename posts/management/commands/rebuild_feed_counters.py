@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+
+from posts.archive import archive_databases
+from posts.counts import post_databases
+from posts.models import FeedCounter, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики постов всех лент: общей, сообществ "
+        "и авторов (с архивными постами). Нужен для больших лент, "
+        "которые без счетчика показывают оценку, и после массовой "
+        "загрузки постов."
+    )
+
+    def handle(self, *args, **options):
+        counters = Counter()
+        for alias in post_databases():
+            posts = Post.objects.using(alias).order_by()
+            counters["index"] += posts.count()
+            for prefix, column in (("profile", "author_id"),
+                                   ("group", "group_id")):
+                rows = posts.filter(
+                    **{f"{column}__isnull": False}
+                    ).values_list(column).annotate(total=Count("id"))
+                for key, total in rows:
+                    counters[f"{prefix}:{key}"] += total
+        # Архивные посты показываются только в профилях авторов.
+        for alias in archive_databases():
+            rows = Post.objects.using(alias).order_by().values_list(
+                "author_id"
+                ).annotate(total=Count("id"))
+            for key, total in rows:
+                counters[f"profile:{key}"] += total
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            table = FeedCounter.objects.using(DEFAULT_DB_ALIAS)
+            table.all().delete()
+            table.bulk_create(
+                FeedCounter(name=name, value=value)
+                for name, value in counters.items()
+            )
+        self.stdout.write(f"Пересчитано счетчиков: {len(counters)}")
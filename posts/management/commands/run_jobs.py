@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import jobs
+from posts.models import BackgroundJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет фоновые задачи админки, оставшиеся в очереди, например "
+        "после перезапуска сервера. С --resume перезапускает и прерванные "
+        "задачи: они проходят выборку заново, что для них безопасно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--resume", action="store_true")
+
+    def handle(self, *args, **options):
+        statuses = [BackgroundJob.PENDING]
+        if options["resume"]:
+            statuses.append(BackgroundJob.RUNNING)
+        job_ids = BackgroundJob.objects.filter(
+            status__in=statuses
+            ).order_by("created").values_list("pk", flat=True)
+        for job_id in list(job_ids):
+            background_job = jobs.run(job_id)
+            self.stdout.write(
+                f"{background_job}: {background_job.done} "
+                f"из {background_job.total}"
+            )
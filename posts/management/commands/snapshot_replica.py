@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Копирует основную базу SQLite в файл реплики."
+
+    def add_arguments(self, parser):
+        parser.add_argument("replica", help="Псевдоним реплики в DATABASES.")
+        parser.add_argument(
+            "--source", default=DEFAULT_DB_ALIAS,
+            help="Псевдоним базы, с которой снимается копия.",
+        )
+
+    def handle(self, *args, **options):
+        source = connections[options["source"]]
+        replica = connections[options["replica"]]
+        for connection in (source, replica):
+            if connection.vendor != "sqlite":
+                raise CommandError(
+                    f"База {connection.alias} не является базой SQLite."
+                )
+        source.ensure_connection()
+        # Резервное копирование SQLite дает согласованный снимок,
+        # не блокируя писателей основной базы на все время копирования.
+        # Соединение открывает бэкенд Django: он понимает и имена-URI
+        # (file:...), как у баз в памяти.
+        target = replica.get_new_connection(replica.get_connection_params())
+        try:
+            source.connection.backup(target, pages=1024)
+        finally:
+            target.close()
+        replica.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Снимок {source.alias} записан в {replica.alias}."
+        ))
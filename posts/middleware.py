@@ -0,0 +1,31 @@
+from django.conf import settings
+
+from . import routers
+
+
+class PrimaryPinningMiddleware:
+    """
+    Закрепляет пользователя за основной базой на REPLICA_PIN_SECONDS секунд
+    после любой записи. Отметка хранится в cookie, чтобы не трогать сессию.
+    Закрепленный пользователь не получает и устаревших копий лент из кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE
+        routers.begin_request(pinned=cookie in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request()
+        if wrote:
+            response.set_cookie(
+                cookie,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,90 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:39
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+
+# Копия posts.models.render_text и render_excerpt на момент миграции:
+# правки модели не должны менять то, что делает старая миграция.
+EXCERPT_LENGTH = 500
+
+
+def render_text(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def render_excerpt(text):
+    return render_text(Truncator(text).chars(EXCERPT_LENGTH))
+
+
+def render_rows(queryset, fields, render):
+    """ Заполняет поля HTML пачками по BATCH_SIZE строк. """
+    batch = []
+    for obj in queryset.only('id', 'text').iterator():
+        render(obj)
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            queryset.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        queryset.bulk_update(batch, fields)
+
+
+def render_posts(apps, schema_editor):
+    def render(post):
+        post.text_html = render_text(post.text)
+        post.excerpt_html = render_excerpt(post.text)
+
+    Post = apps.get_model('posts', 'Post')
+    render_rows(
+        Post.objects.using(schema_editor.connection.alias),
+        ['text_html', 'excerpt_html'],
+        render,
+    )
+
+
+def render_comments(apps, schema_editor):
+    def render(comment):
+        comment.text_html = render_text(comment.text)
+
+    Comment = apps.get_model('posts', 'Comment')
+    render_rows(
+        Comment.objects.using(schema_editor.connection.alias),
+        ['text_html'],
+        render,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20261018_2227'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(
+            render_posts, migrations.RunPython.noop,
+            hints={'model_name': 'post'},
+        ),
+        migrations.RunPython(
+            render_comments, migrations.RunPython.noop,
+            hints={'model_name': 'comment'},
+        ),
+    ]
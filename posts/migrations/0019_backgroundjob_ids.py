@@ -0,0 +1,22 @@
+# Generated by Django 2.2.6 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='backgroundjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='ids',
+            field=models.TextField(default='[]', verbose_name='id строк'),
+        ),
+    ]
@@ -1,9 +1,33 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
 
 User = get_user_model()
 
 
+def render_text(text):
+    """ Безопасный HTML текста: экранирование и переносы строк в <br>. """
+    return linebreaksbr(text, autoescape=True)
+
+
+def render_excerpt(text):
+    """ HTML начала текста для карточек в лентах. """
+    return render_text(Truncator(text).chars(settings.POST_EXCERPT_LENGTH))
+
+
+class ShardedManager(models.Manager):
+    def create(self, **kwargs):
+        """
+        Сохраняет объект через save() без явной базы, чтобы маршрутизатор
+        выбрал шард по автору сохраняемого объекта.
+        """
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
 class Group(models.Model):
     title = models.CharField(
         verbose_name="Название сообщества",
@@ -25,6 +49,13 @@ class Group(models.Model):
         blank=True,
         null=True,
     )
+    # Удаленное сообщество скрыто сразу, а посты от него отвязывает
+    # и саму строку удаляет фоновая задача (posts.jobs.purge_groups).
+    is_deleted = models.BooleanField(
+        verbose_name="Удалено",
+        default=False,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
@@ -38,12 +69,16 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации",
         auto_now_add=True,
+        db_index=True,
     )
+    # Посты могут жить в шардах (POST_SHARDS), где нет таблиц
+    # пользователей и сообществ, поэтому внешние ключи без ограничений.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="posts",
         verbose_name="Автор",
+        db_constraint=False,
     )
     group = models.ForeignKey(
         Group,
@@ -54,6 +89,7 @@ class Post(models.Model):
         verbose_name="Сообщество",
         help_text="Выберите сообщество для публикации поста. "
                   "А если хотите, то не выбирайте. Это необязательно.",
+        db_constraint=False,
     )
     image = models.ImageField(
         upload_to='posts/',
@@ -61,6 +97,11 @@ class Post(models.Model):
         null=True,
         verbose_name="Изображение:",
         help_text="Выберите изображение для своего поста.")
+    # HTML текста считается один раз при сохранении, а не при каждом рендере.
+    text_html = models.TextField(editable=False, default="")
+    excerpt_html = models.TextField(editable=False, default="")
+
+    objects = ShardedManager()
 
     class Meta():
         ordering = ("-pub_date",)
@@ -68,8 +109,19 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        self.excerpt_html = render_excerpt(self.text)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_truncated(self):
+        return self.excerpt_html != self.text_html
+
 
 class Comment(models.Model):
+    # Комментарии и подписки могут жить в отдельных файлах SQLite
+    # (DATABASE_SUBSYSTEMS), поэтому внешние ключи без ограничений в базе.
     text = models.TextField(
         verbose_name="Текст комментария.",
         help_text="Поведайте, что вы думаете по поводу этого поста."
@@ -77,19 +129,25 @@ class Comment(models.Model):
     created = models.DateTimeField(
         verbose_name="Дата публикации комментария.",
         auto_now_add=True,
+        db_index=True,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="comments",
         verbose_name="Автор комментария.",
+        db_constraint=False,
     )
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name="comments",
-        verbose_name="Пост к комментарию."
+        verbose_name="Пост к комментарию.",
+        db_constraint=False,
     )
+    text_html = models.TextField(editable=False, default="")
+
+    objects = ShardedManager()
 
     class Meta():
         ordering = ("-created",)
@@ -97,6 +155,10 @@ class Comment(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -104,12 +166,14 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="follower",
         verbose_name="Подписчик",
+        db_constraint=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="following",
         verbose_name="Автор",
+        db_constraint=False,
     )
 
     class Meta():
@@ -118,3 +182,113 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_follow"
             )
         ]
+
+
+class AuthorShard(models.Model):
+    """
+    Явное закрепление автора за шардом. Авторы без записи живут в шарде,
+    вычисленном по их id, а запись появляется после переноса автора.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shard",
+        verbose_name="Автор",
+    )
+    alias = models.CharField(
+        verbose_name="Псевдоним базы шарда",
+        max_length=100,
+    )
+
+    def __str__(self):
+        return f"{self.author_id} -> {self.alias}"
+
+
+class DeletedAuthor(models.Model):
+    """
+    Удаленный автор: его посты и комментарии скрыты сразу, а строки
+    стирает фоновая задача (posts.jobs.purge_users) вместе с самим
+    пользователем.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="deletion",
+        verbose_name="Автор",
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата удаления",
+        auto_now_add=True,
+    )
+
+    def __str__(self):
+        return f"{self.author_id}"
+
+
+class Sequence(models.Model):
+    """
+    Глобальные счетчики id для шардированных моделей: id поста
+    не меняется при переносе автора между шардами.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class FeedCounter(models.Model):
+    """
+    Число постов в ленте ("index", "group:<id>", "profile:<id>"),
+    которое обновляется при записи постов, см. posts.counts.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Фоновая задача над выборкой строк (см. posts.jobs): выборка
+    хранится как список id в JSON, а прогресс - в done и total.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(verbose_name="Задача", max_length=100)
+    model = models.CharField(verbose_name="Модель", max_length=100)
+    ids = models.TextField(verbose_name="id строк", default="[]")
+    params = models.TextField(verbose_name="Параметры", default="{}")
+    status = models.CharField(
+        verbose_name="Состояние",
+        max_length=20,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    total = models.PositiveIntegerField(
+        verbose_name="Всего строк", null=True, blank=True
+    )
+    done = models.PositiveIntegerField(verbose_name="Обработано", default=0)
+    error = models.TextField(verbose_name="Ошибка", blank=True)
+    created = models.DateTimeField(
+        verbose_name="Создана", auto_now_add=True
+    )
+    finished = models.DateTimeField(
+        verbose_name="Завершена", null=True, blank=True
+    )
+
+    class Meta():
+        ordering = ("-created",)
+
+    def __str__(self):
+        return f"#{self.pk} {self.name}: {self.get_status_display()}"
@@ -0,0 +1,112 @@
+"""
+Паджинация лент.
+
+Число постов ленты берется из счетчика (posts.counts), если он передан.
+Иначе с PAGINATION["EXACT_COUNT"] = False общее число постов не считается:
+вместо COUNT(*) по всей ленте проверяется только, есть ли хотя бы один
+пост после текущей страницы. Паджинатор тогда знает о страницах только
+до следующей, и шаблон не показывает ссылку на последнюю страницу.
+Так же листается лента, для которой есть только оценка числа постов:
+оценка может быть меньше настоящего числа, и страницы за ней пропали бы.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .counts import table_estimate
+
+
+def _page_number(page_number):
+    try:
+        return max(int(page_number), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def paginate(object_list, page_number, per_page=10, count=None):
+    """
+    Возвращает паджинатор и страницу с постами, как Paginator.get_page.
+    count - готовое число постов ленты (posts.counts.FeedCount).
+    """
+    paginator = Paginator(object_list, per_page)
+    paginator.count_is_exact = True
+    if count is not None and count.exact:
+        paginator.__dict__["count"] = count.value
+        return paginator, paginator.get_page(page_number)
+    if count is None and settings.PAGINATION["EXACT_COUNT"]:
+        return paginator, paginator.get_page(page_number)
+
+    number = _page_number(page_number)
+    top = number * per_page
+    # Один пост после страницы показывает, есть ли следующая.
+    has_next = bool(list(object_list[top:top + 1]))
+    if not has_next and number > 1:
+        # Номер может указывать за конец ленты: тогда нужен точный счет,
+        # чтобы, как get_page, отдать последнюю страницу.
+        return paginator, paginator.get_page(number)
+    # Не точное число, но его хватает, чтобы Page знал о следующей странице.
+    paginator.__dict__["count"] = top + 1 if has_next else top
+    paginator.count_is_exact = False
+    return paginator, paginator.page(number)
+
+
+def page_window(page):
+    """
+    Номера страниц для ссылок паджинатора: первые и последние ENDS страниц
+    и WINDOW страниц по обе стороны от текущей. None - пропуск (многоточие).
+    """
+    options = settings.PAGINATION
+    on_each_side, on_ends = options["WINDOW"], options["ENDS"]
+    paginator = page.paginator
+    number, num_pages = page.number, paginator.num_pages
+
+    if number > on_each_side + on_ends + 2:
+        window = list(range(1, on_ends + 1))
+        window.append(None)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window = list(range(1, number + 1))
+
+    if not paginator.count_is_exact:
+        # Известна только следующая страница, дальше - неизвестно сколько.
+        window.extend(range(number + 1, num_pages + 1))
+        if num_pages > number:
+            window.append(None)
+    elif number < num_pages - on_each_side - on_ends - 1:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Паджинатор админки для больших таблиц: число строк таблицы без
+    фильтров берется из статистики SQLite, если по ней строк не меньше
+    FEED_COUNTS["EXACT_LIMIT"]. Отфильтрованные выборки считаются точно.
+
+    Статистика отстает от таблицы, поэтому оценка - только нижняя граница.
+    Конец последней страницы по оценке (или запрошенной страницы
+    page_hint, если она дальше) проверяется одной строкой: если за ним
+    есть строки, паджинатор показывает следующую страницу, а иначе
+    досчитывает строки последней страницы точно.
+    """
+    page_hint = 1
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        estimate = table_estimate(queryset.model, queryset.db)
+        if (estimate is None
+                or estimate < settings.FEED_COUNTS["EXACT_LIMIT"]):
+            return super().count
+        estimated_pages = -(-estimate // self.per_page)
+        top = max(estimated_pages, self.page_hint) * self.per_page
+        if queryset[top:top + 1].exists():
+            return top + 1
+        start = top - self.per_page
+        return start + queryset[start:top].count()
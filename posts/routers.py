@@ -0,0 +1,226 @@
+"""
+Маршрутизаторы баз данных проекта.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import archive, sharding
+from .models import Comment, Post, User
+
+# Состояние текущего запроса: закреплен ли пользователь за основной базой
+# и была ли в запросе запись.
+_request_state = threading.local()
+
+
+def begin_request(pinned=False):
+    """ Сбрасывает состояние маршрутизации в начале запроса. """
+    _request_state.pinned = pinned
+    _request_state.wrote = False
+
+
+def end_request():
+    """
+    Сбрасывает состояние маршрутизации в конце запроса.
+    Возвращает True, если в запросе была запись.
+    """
+    wrote = getattr(_request_state, "wrote", False)
+    _request_state.pinned = False
+    _request_state.wrote = False
+    return wrote
+
+
+def note_write():
+    """ Отмечает, что текущий запрос записал данные в основную базу. """
+    _request_state.wrote = True
+    # Дочитываем запрос из основной базы, чтобы увидеть свою запись.
+    _request_state.pinned = True
+
+
+def is_pinned():
+    return getattr(_request_state, "pinned", False)
+
+
+def subsystem_alias(model):
+    """
+    Возвращает псевдоним отдельной базы модели из DATABASE_SUBSYSTEMS
+    или None, если модель живет в основной базе.
+    """
+    alias = settings.DATABASE_SUBSYSTEMS.get(model._meta.label_lower)
+    if alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def known_databases():
+    """ Псевдонимы баз, объекты которых можно связывать между собой. """
+    return {
+        DEFAULT_DB_ALIAS,
+        *settings.DATABASE_REPLICAS,
+        *settings.DATABASE_SUBSYSTEMS.values(),
+        *sharding.shards(),
+        *archive.archive_databases(),
+    }
+
+
+class ArchiveRouter:
+    """
+    Посты и комментарии, связанные с объектом из архива (POST_ARCHIVE),
+    читаются и пишутся в архиве, а автор и сообщество - в основной базе.
+    Запросы без объекта-подсказки в архив не попадают: архив читают
+    явно posts.archive и posts.feeds.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def _route(self, model, hints):
+        instance = hints.get("instance")
+        if instance is None or not archive.is_archived(instance):
+            return None
+        if archive.is_archived_model(model):
+            return instance._state.db
+        return subsystem_alias(model) or DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = known_databases()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != archive.archive_alias():
+            return None
+        return f"{app_label}.{model_name}" in archive.ARCHIVED_MODELS
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтение моделей постов на реплики, а запись - в основную базу.
+    Пользователь, который недавно писал, читает только из основной базы,
+    чтобы сразу видеть свои посты и комментарии. Запрос закрепляют
+    сигналы сохранения и удаления (posts.signals), а не выбор базы
+    для записи: его спрашивают и get_or_create, и сохранение сессии.
+    """
+    read_apps = {"posts"}
+    # Фоновую задачу читают сразу после постановки в очередь, а ее
+    # прогресс меняется каждую пачку: в снимке реплики их еще нет.
+    primary_models = {"posts.backgroundjob"}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or is_pinned()
+                or model._meta.app_label not in self.read_apps
+                or model._meta.label_lower in self.primary_models
+                or subsystem_alias(model)
+                or sharding.is_sharded_model(model)):
+            return None
+        return random.choice(replicas)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        databases = known_databases()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе со снимком основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class SubsystemRouter:
+    """
+    Разносит горячие на запись таблицы (сессии, подписки, комментарии)
+    по отдельным файлам SQLite, у каждого из которых своя блокировка записи.
+
+    В основной базе таблицы этих моделей тоже создаются и остаются пустыми:
+    каскадное удаление Django ищет связанные строки в базе удаляемого
+    объекта, а настоящие строки удаляют обработчики из posts.signals.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def _route(self, model, hints):
+        alias = subsystem_alias(model)
+        if alias is not None:
+            return alias
+        # Связанные объекты (автор комментария, пост подписки) читаются
+        # из основной базы, а не из базы объекта-подсказки.
+        instance = hints.get("instance")
+        if (instance is not None and instance._state.db
+                in settings.DATABASE_SUBSYSTEMS.values()):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = known_databases()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in settings.DATABASE_SUBSYSTEMS.values():
+            return None
+        label = f"{app_label}.{model_name}"
+        return settings.DATABASE_SUBSYSTEMS.get(label) == db
+
+
+class ShardRouter:
+    """
+    Направляет посты и комментарии в шард автора поста (POST_SHARDS).
+    Запросы без объекта-подсказки маршрутизатор не угадывает: для них
+    posts.feeds явно собирает выборки по шардам.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def _route(self, model, hints):
+        aliases = sharding.shards()
+        if not aliases:
+            return None
+        instance = hints.get("instance")
+        if not sharding.is_sharded_model(model):
+            # Автор и сообщество поста из шарда живут в основной базе.
+            if instance is not None and instance._state.db in aliases:
+                return subsystem_alias(model) or DEFAULT_DB_ALIAS
+            return None
+        if instance is None:
+            return None
+        if instance._state.db in aliases:
+            return instance._state.db
+        if isinstance(instance, Post):
+            return sharding.shard_for_author(instance.author_id)
+        if isinstance(instance, Comment):
+            return sharding.shard_for_comment(instance)
+        if isinstance(instance, User) and model is Post:
+            # Посты автора через author.posts. Комментарии пользователя
+            # лежат в шардах авторов постов, а не в его собственном.
+            return sharding.shard_for_author(instance.pk)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = known_databases()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in sharding.shards():
+            return None
+        return f"{app_label}.{model_name}" in sharding.SHARDED_MODELS
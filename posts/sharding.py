@@ -0,0 +1,153 @@
+"""
+Шардирование постов и комментариев по автору.
+
+Посты автора и все комментарии к ним лежат в одном шарде, поэтому страницы
+автора и поста обращаются ровно к одной базе. Шард автора определяется
+явным закреплением (AuthorShard) или, если его нет, остатком от деления
+id автора на число шардов. Общие ленты собираются со всех шардов
+и сливаются по дате публикации.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Max, prefetch_related_objects
+
+from .models import AuthorShard, Comment, Post, Sequence
+
+SHARDED_MODELS = {"posts.post", "posts.comment"}
+
+SHARD_CACHE_KEY = "post-shard:{}"
+
+
+def shards():
+    """ Псевдонимы шардов из POST_SHARDS, описанные в DATABASES. """
+    return [
+        alias for alias in settings.POST_SHARDS
+        if alias in settings.DATABASES
+    ]
+
+
+def is_sharded_model(model):
+    return bool(shards()) and model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_for_author(author_id):
+    """ Возвращает псевдоним шарда, в котором живут посты автора. """
+    aliases = shards()
+    if not aliases:
+        return None
+    key = SHARD_CACHE_KEY.format(author_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = AuthorShard.objects.using(DEFAULT_DB_ALIAS).filter(
+            author_id=author_id
+        ).values_list("alias", flat=True).first() or ""
+        cache.set(key, alias, None)
+    return alias or aliases[author_id % len(aliases)]
+
+
+def assign_shard(author_id, alias):
+    """ Закрепляет автора за шардом. """
+    AuthorShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        author_id=author_id, defaults={"alias": alias}
+    )
+    cache.set(SHARD_CACHE_KEY.format(author_id), alias, None)
+
+
+def next_id(model, count=1):
+    """
+    Выдает следующий глобальный id для шардированной модели, а с count
+    больше 1 - последний из count id подряд (для массовой загрузки).
+    Счетчик живет в основной базе и при первом обращении продолжает
+    нумерацию с наибольшего id по всем шардам.
+    """
+    name = model._meta.label_lower
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        sequences = Sequence.objects.using(DEFAULT_DB_ALIAS)
+        if not sequences.filter(name=name).update(value=F("value") + count):
+            top = max(
+                (model.objects.using(alias).aggregate(top=Max("id"))["top"]
+                 or 0 for alias in shards()),
+                default=0,
+            )
+            sequences.create(name=name, value=top + count)
+        return sequences.get(name=name).value
+
+
+def find_post(post_id):
+    """ Ищет пост по id во всех шардах. """
+    for alias in shards():
+        post = Post.objects.using(alias).filter(id=post_id).first()
+        if post is not None:
+            return post
+    return None
+
+
+def shard_for_comment(comment):
+    """ Комментарий живет в шарде своего поста. """
+    if Comment.post.is_cached(comment):
+        return comment.post._state.db
+    post = find_post(comment.post_id)
+    return post._state.db if post is not None else None
+
+
+class ScatterGatherFeed:
+    """
+    Лента, собранная со всех шардов: каждый шард отдает свои посты,
+    упорядоченные по убыванию даты, а результат сливается в один поток.
+    Поддерживает count() и срезы, поэтому подходит для Paginator.
+    """
+    ordered = True
+
+    def __init__(self, querysets, prefetch=("author", "group"),
+                 key=lambda post: (post.pub_date, post.id)):
+        self.querysets = [
+            queryset.order_by("-pub_date", "-id") for queryset in querysets
+        ]
+        self.prefetch = prefetch
+        self.key = key
+
+    def filter(self, *args, **kwargs):
+        return type(self)(
+            (queryset.filter(*args, **kwargs) for queryset in self.querysets),
+            self.prefetch,
+            self.key,
+        )
+
+    def values(self, *fields):
+        """ Строки-словари вместо постов, как QuerySet.values(). """
+        fields = tuple(dict.fromkeys(fields + ("pub_date", "id")))
+        return type(self)(
+            (queryset.values(*fields) for queryset in self.querysets),
+            prefetch=(),
+            key=lambda row: (row["pub_date"], row["id"]),
+        )
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def _merge(self, sources):
+        return heapq.merge(*sources, key=self.key, reverse=True)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        # Каждый шард отдает не больше stop постов: глубже среза
+        # слияние не заглянет.
+        sources = [list(queryset[:index.stop]) for queryset in self.querysets]
+        posts = list(islice(self._merge(sources), start, index.stop))
+        if self.prefetch:
+            prefetch_related_objects(posts, *self.prefetch)
+        return posts
+
+    def __iter__(self):
+        return self._merge(
+            queryset.iterator() for queryset in self.querysets
+        )
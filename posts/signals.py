@@ -0,0 +1,125 @@
+from django.db import router
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import archive, counts, routers, sharding
+from .feed_cache import bump_feed_version
+from .models import Comment, Follow, Group, Post, User
+
+
+def _databases(model):
+    """ Базы, в которых живут строки модели, вместе с архивом. """
+    if sharding.is_sharded_model(model):
+        databases = sharding.shards()
+    else:
+        databases = [router.db_for_write(model)]
+    if archive.is_archived_model(model):
+        databases = databases + archive.archive_databases()
+    return databases
+
+
+def _delete_elsewhere(model, using, **lookups):
+    """
+    Удаляет строки модели, если она живет не в той базе, из которой
+    удаляется связанный объект. Каскад Django до них не дотягивается.
+    """
+    for database in _databases(model):
+        if database != using:
+            model.objects.using(database).filter(**lookups).delete()
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def allocate_sharded_id(sender, instance, **kwargs):
+    if instance.pk is None and sharding.is_sharded_model(sender):
+        instance.pk = sharding.next_id(sender)
+
+
+@receiver(pre_delete, sender=Post)
+def delete_post_comments(sender, instance, using, **kwargs):
+    # В шарде комментарии лежат рядом с постом и удаляются каскадом.
+    if not sharding.is_sharded_model(Comment):
+        _delete_elsewhere(Comment, using, post_id=instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_activity(sender, instance, using, **kwargs):
+    _delete_elsewhere(Post, using, author_id=instance.pk)
+    _delete_elsewhere(Comment, using, author_id=instance.pk)
+    _delete_elsewhere(Follow, using, user_id=instance.pk)
+    _delete_elsewhere(Follow, using, author_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def detach_group_posts(sender, instance, using, **kwargs):
+    for database in _databases(Post):
+        if database != using:
+            Post.objects.using(database).filter(
+                group_id=instance.pk
+            ).update(group=None)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def pin_to_primary(sender, **kwargs):
+    # Запрос записал пост, комментарий или подписку: дочитываем его
+    # из основной базы.
+    routers.note_write()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, using, **kwargs):
+    """ Прежнее сообщество поста: при его смене сдвигаются два счетчика. """
+    if not instance._state.adding:
+        instance._saved_group_id = sender.objects.using(using).filter(
+            pk=instance.pk
+            ).values_list("group_id", flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counts.adjust(counts.feed_names(instance), 1)
+        return
+    if archive.is_archived(instance):
+        # Архивные посты не входят в ленты сообществ.
+        return
+    old_group_id = getattr(instance, "_saved_group_id", None)
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            counts.adjust([f"group:{old_group_id}"], -1)
+        if instance.group_id:
+            counts.adjust([f"group:{instance.group_id}"], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counts.adjust(counts.feed_names(instance), -1)
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_count(sender, instance, **kwargs):
+    counts.forget([f"group:{instance.pk}"])
+
+
+@receiver(post_delete, sender=User)
+def forget_author_count(sender, instance, **kwargs):
+    counts.forget([f"profile:{instance.pk}"])
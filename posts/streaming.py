@@ -0,0 +1,68 @@
+"""
+Потоковая отдача страниц лент (FEED_STREAMING["ENABLED"]).
+
+Сначала отправляется <head> страницы со ссылками на стили и скрипты:
+браузер грузит их, пока сервер читает ленту. Затем рендерится тело
+страницы, в котором вместо карточек стоит метка CARDS_MARKER: все до метки
+уходит сразу, карточки - пачками по FEED_STREAMING["BATCH"], остаток
+страницы - в конце.
+
+Части страницы выбирает переменная stream_part в base.html:
+"head" - только <head>, "body" - только <body>. Каждая часть потока -
+целый результат рендера, поэтому метки posts.holes не разрываются.
+Cookie после начала потока уже не отправить, так что форм с csrf-токеном
+на потоковых страницах быть не должно.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import get_template
+
+from . import routers
+from .fragments import render_fragments
+
+CARDS_MARKER = "<!--stream:cards-->"
+
+
+class StreamedCards:
+    """ Подставляется вместо карточек: тег post_cards выводит метку. """
+
+
+def render_feed(request, template_name, build_context, head_context=None):
+    """
+    Рендерит страницу ленты. build_context() собирает контекст тела
+    страницы; head_context нужен уже для <head> (например, для <title>).
+    """
+    head_context = head_context or {}
+    if not settings.FEED_STREAMING["ENABLED"]:
+        return render(
+            request, template_name, {**head_context, **build_context()}
+        )
+    template = get_template(template_name)
+    # Тело страницы рендерится уже после выхода из middleware:
+    # закрепление за основной базой переносим в генератор.
+    pinned = routers.is_pinned()
+
+    def chunks():
+        yield template.render(
+            {**head_context, "stream_part": "head"}, request
+        )
+        routers.begin_request(pinned)
+        try:
+            context = {**head_context, **build_context()}
+            cards = context["cards"]
+            context.update(cards=StreamedCards(), stream_part="body")
+            before, after = template.render(context, request).split(
+                CARDS_MARKER, 1
+            )
+            yield before
+            batch_size = settings.FEED_STREAMING["BATCH"]
+            for start in range(0, len(cards), batch_size):
+                yield "".join(
+                    render_fragments(cards[start:start + batch_size])
+                )
+            yield after
+        finally:
+            routers.end_request()
+
+    return StreamingHttpResponse(chunks())
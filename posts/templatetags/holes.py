@@ -0,0 +1,38 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.holes import block_markers, hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(name, *args):
+    """ Метка персональной вставки, см. posts.holes. """
+    return mark_safe(hole_marker(name, *args))
+
+
+class HoleBlockNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        start, end = block_markers(self.name.resolve(context))
+        return start + self.nodelist.render(context) + end
+
+
+@register.tag
+def holeblock(parser, token):
+    """
+    Блок, который показывается или скрывается для пользователя
+    уже после рендера: {% holeblock "authenticated" %}...{% endholeblock %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]} принимает ровно одно имя блока."
+        )
+    nodelist = parser.parse(("endholeblock",))
+    parser.delete_first_token()
+    return HoleBlockNode(parser.compile_filter(bits[1]), nodelist)
@@ -0,0 +1,25 @@
+from django import template
+
+from posts.paging import page_window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_links(page):
+    """ Номера страниц для паджинатора, None - многоточие. """
+    return page_window(page)
+
+
+@register.filter
+def approx_count(count):
+    """
+    Число постов ленты (posts.counts.FeedCount): точное как есть,
+    оценку - округленно, например «~1.2M».
+    """
+    if count.exact:
+        return str(count.value)
+    for limit, suffix in ((10 ** 6, "M"), (10 ** 3, "K")):
+        if count.value >= limit:
+            return f"~{count.value / limit:.1f}{suffix}"
+    return f"~{count.value}"
@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.fragments import render_cards
+from posts.streaming import CARDS_MARKER, StreamedCards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(*cards):
+    """
+    Выводит карточки постов из кеша фрагментов.
+    Принимает список карточек или одну карточку: {% post_cards card %}.
+    """
+    if len(cards) == 1 and isinstance(cards[0], StreamedCards):
+        # Карточки отдаст posts.streaming.render_feed.
+        return mark_safe(CARDS_MARKER)
+    if len(cards) == 1 and isinstance(cards[0], (list, tuple)):
+        cards = cards[0]
+    return mark_safe(render_cards(cards))
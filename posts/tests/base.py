@@ -0,0 +1,35 @@
+"""
+Общая заготовка тестов лент.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts.models import Group, Post, User
+
+
+class FeedTestCase(TestCase):
+    """
+    Автор с постами «Пост 0», «Пост 1», ... в сообществе и читатель.
+    Имена, сообщество и число постов задаются атрибутами класса. Кеш
+    очищается до и после каждого теста.
+    """
+    author_name = "author"
+    reader_name = "reader"
+    group_title = "Сообщество"
+    group_slug = "group"
+    post_count = 5
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username=self.author_name)
+        self.reader = User.objects.create_user(username=self.reader_name)
+        self.group = Group.objects.create(
+            title=self.group_title, slug=self.group_slug
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f"Пост {number}", author=self.author, group=self.group
+            )
+            for number in range(self.post_count)
+        ]
@@ -0,0 +1,107 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paging import EstimatedCountPaginator
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin"
+        )
+        self.client.force_login(self.admin)
+        self.group = Group.objects.create(title="Админка", slug="admin")
+
+    def add_rows(self, number):
+        start = User.objects.count()
+        for index in range(start, start + number):
+            author = User.objects.create_user(username=f"admin-{index}")
+            post = Post.objects.create(
+                text=f"Пост {index}", author=author, group=self.group
+            )
+            Comment.objects.create(post=post, author=author, text="Текст")
+            Follow.objects.create(user=self.admin, author=author)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        urls = [
+            reverse(f"admin:posts_{model}_changelist")
+            for model in ("post", "comment", "follow")
+        ]
+        self.add_rows(2)
+        # Первый запрос кладет пользователя в кеш.
+        self.client.get(urls[0])
+        few = [self.count_queries(url) for url in urls]
+        self.add_rows(10)
+        self.assertEqual([self.count_queries(url) for url in urls], few)
+
+    def test_autocomplete_filter(self):
+        self.add_rows(3)
+        author = User.objects.get(username="admin-2")
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"),
+            {"author__id__exact": author.pk},
+        )
+        self.assertEqual(
+            [post.author for post in response.context["cl"].result_list],
+            [author],
+        )
+        self.assertContains(response, "admin-autocomplete")
+        self.assertContains(response, "select2")
+        self.assertNotContains(response, "admin-3")
+
+    def test_date_hierarchy(self):
+        self.add_rows(1)
+        year = Post.objects.get().pub_date.year
+        response = self.client.get(
+            reverse("admin:posts_comment_changelist"),
+            {"created__year": year},
+        )
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username="estimate-author")
+        for index in range(3):
+            Post.objects.create(text=f"Пост {index}", author=author)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        Post.objects.create(text="После ANALYZE", author=author)
+
+    @override_settings(FEED_COUNTS={"EXACT_LIMIT": 2})
+    def test_unfiltered_table_uses_statistics(self):
+        """ Без COUNT(*) по таблице, но последняя страница досчитана. """
+        with CaptureQueriesContext(connection) as queries:
+            paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.count, 4)
+        self.assertFalse(any(
+            'SELECT COUNT(*) AS "__count" FROM "posts_post"' in query["sql"]
+            for query in queries.captured_queries
+        ))
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__startswith="Пост"), 10
+        )
+        self.assertEqual(paginator.count, 3)
+
+    @override_settings(FEED_COUNTS={"EXACT_LIMIT": 2})
+    def test_rows_past_the_estimate_are_reachable(self):
+        """ Оценка - нижняя граница: за полной страницей есть следующая. """
+        paginator = EstimatedCountPaginator(Post.objects.order_by("id"), 3)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual(
+            list(paginator.page(2).object_list),
+            [Post.objects.order_by("id").last()],
+        )
+
+    def test_small_tables_are_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 4)
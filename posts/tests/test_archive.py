@@ -0,0 +1,176 @@
+import datetime as dt
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counts, feeds
+from posts.bulk import keep_auto_dates
+from posts.models import Comment, Post
+from posts.routers import ArchiveRouter
+from posts.tests.base import FeedTestCase
+
+
+@override_settings(POST_ARCHIVE={"DATABASE": "archive", "AGE_DAYS": 30})
+class ArchiveTests(FeedTestCase):
+    databases = {"default", "archive"}
+    author_name = "veteran"
+    group_title = "Старое"
+    group_slug = "old"
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for number, post in enumerate(self.posts):
+            # Посты 3 и 4 старше границы архива.
+            days = 100 + number if number >= 3 else number
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - dt.timedelta(days=days)
+            )
+        self.old_post = self.posts[3]
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text="Давно было"
+        )
+        # Счетчики лент появляются при первом чтении.
+        counts.global_count()
+        counts.group_count(self.group)
+        counts.author_count(self.author)
+
+    def archive(self):
+        call_command("archive_posts", "--batch-size", "1", stdout=StringIO())
+
+    def test_old_posts_and_comments_move_to_archive(self):
+        self.archive()
+        self.assertEqual(
+            sorted(Post.objects.values_list("text", flat=True)),
+            ["Пост 0", "Пост 1", "Пост 2"],
+        )
+        self.assertEqual(
+            sorted(Post.objects.using("archive").values_list(
+                "text", flat=True
+            )),
+            ["Пост 3", "Пост 4"],
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertTrue(
+            Comment.objects.using("archive").filter(
+                post_id=self.old_post.pk
+            ).exists()
+        )
+        # Общая лента и лента сообщества без архива, профиль - с ним.
+        self.assertEqual(counts.global_count().value, 3)
+        self.assertEqual(counts.group_count(self.group).value, 3)
+        self.assertEqual(counts.author_count(self.author).value, 5)
+
+    def test_rerun_does_not_duplicate(self):
+        self.archive()
+        self.archive()
+        self.assertEqual(Post.objects.using("archive").count(), 2)
+        self.assertEqual(counts.global_count().value, 3)
+
+    def test_interrupted_copy_is_replaced_by_current_rows(self):
+        """
+        Копия от прерванного запуска заменяется текущей строкой,
+        а правка поста после нее не теряется.
+        """
+        with keep_auto_dates(Post):
+            Post.objects.using("archive").bulk_create(
+                [Post.objects.get(pk=self.old_post.pk)]
+            )
+        Post.objects.filter(pk=self.old_post.pk).update(text="Исправлено")
+        self.archive()
+        self.assertEqual(
+            Post.objects.using("archive").get(pk=self.old_post.pk).text,
+            "Исправлено",
+        )
+        self.assertEqual(counts.global_count().value, 3)
+
+    def test_profile_falls_through_to_archive(self):
+        self.archive()
+        response = self.client.get(
+            reverse("profile", kwargs={"username": "veteran"})
+        )
+        self.assertEqual(
+            [post.text for post in response.context["page"].object_list],
+            [f"Пост {number}" for number in range(5)],
+        )
+        self.assertEqual(response.context["posts_number"], 5)
+        self.assertNotContains(
+            self.client.get(reverse("index")), "Пост 3"
+        )
+
+    def test_recent_page_does_not_read_archive(self):
+        self.archive()
+        feed = feeds.author_feed(self.author)
+        with self.assertNumQueries(0, using="archive"):
+            self.assertEqual(
+                [post.text for post in feed[0:2]], ["Пост 0", "Пост 1"]
+            )
+        with self.assertNumQueries(1, using="archive"):
+            self.assertEqual(
+                [post.text for post in feed[2:4]], ["Пост 2", "Пост 3"]
+            )
+
+    def test_post_page_reads_archived_post_and_comments(self):
+        self.archive()
+        url = reverse(
+            "post",
+            kwargs={"username": "veteran", "post_id": self.old_post.pk},
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["post"].text, "Пост 3")
+        self.assertEqual(
+            [comment.text for comment in response.context["comments"]],
+            ["Давно было"],
+        )
+
+    def test_api_finds_archived_post(self):
+        self.archive()
+        response = self.client.get(
+            reverse("api:post", args=[self.old_post.pk]), {"fields": "text"}
+        )
+        self.assertEqual(response.json(), {"text": "Пост 3"})
+        response = self.client.get(reverse("api:posts_batch"), {
+            "ids": f"{self.old_post.pk},{self.posts[0].pk}",
+            "fields": "id,comment_count",
+        })
+        self.assertEqual(response.json(), {
+            "results": [
+                {"id": self.old_post.pk, "comment_count": 1},
+                {"id": self.posts[0].pk, "comment_count": 0},
+            ],
+            "missing": [],
+        })
+
+    def test_comment_on_archived_post_is_stored_in_archive(self):
+        self.archive()
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse(
+                "add_comment",
+                kwargs={"username": "veteran", "post_id": self.old_post.pk},
+            ),
+            {"text": "И сейчас помню"},
+        )
+        self.assertEqual(
+            Comment.objects.using("archive").filter(
+                post_id=self.old_post.pk
+            ).count(),
+            2,
+        )
+        self.assertFalse(Comment.objects.exists())
+
+    def test_only_posts_and_comments_migrate_to_archive(self):
+        router = ArchiveRouter()
+        self.assertTrue(
+            router.allow_migrate("archive", "posts", model_name="comment")
+        )
+        self.assertFalse(
+            router.allow_migrate("archive", "posts", model_name="group")
+        )
+        self.assertIsNone(
+            router.allow_migrate("default", "posts", model_name="group")
+        )
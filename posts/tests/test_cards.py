@@ -0,0 +1,61 @@
+import pickle
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import TestCase
+
+from posts.cards import build_cards, decode_cards, encode_cards
+from posts.feed_cache import page_cards
+from posts.models import Comment, Group, Post, User
+
+
+class PostCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="card-author")
+        self.group = Group.objects.create(
+            title="Группа", slug="card-group", description="Описание"
+        )
+        for number in range(10):
+            Post.objects.create(
+                text=f"Пост номер {number}",
+                author=User.objects.create_user(username=f"writer-{number}"),
+                group=self.group,
+            )
+        self.post = Post.objects.create(
+            text="Пост с комментарием", author=self.author, group=self.group
+        )
+        Comment.objects.create(
+            post=self.post, author=self.author, text="Комментарий"
+        )
+
+    def test_round_trip(self):
+        """ Карточка после кодирования и декодирования не меняется. """
+        card = decode_cards(encode_cards(build_cards([self.post])))[0]
+        self.assertEqual(card.id, self.post.id)
+        self.assertEqual(card.text_html, self.post.excerpt_html)
+        self.assertFalse(card.truncated)
+        self.assertEqual(card.pub_date, self.post.pub_date)
+        self.assertEqual(card.author_username, "card-author")
+        self.assertEqual(card.group_slug, "card-group")
+        self.assertEqual(card.group_title, "Группа")
+        self.assertEqual(card.comment_count, 1)
+        self.assertIsNone(card.thumbnail_url)
+
+    def test_encoded_page_is_at_least_three_times_smaller(self):
+        """ Страница карточек в кеше минимум втрое меньше страницы Post. """
+        posts = list(Post.objects.select_related("author", "group")[:10])
+        full = len(pickle.dumps(posts, pickle.HIGHEST_PROTOCOL))
+        compact = len(pickle.dumps(
+            encode_cards(build_cards(posts)), pickle.HIGHEST_PROTOCOL
+        ))
+        self.assertGreaterEqual(full / compact, 3)
+
+    def test_cached_page_is_read_without_queries(self):
+        """ Повторное чтение страницы не обращается к базе. """
+        posts = Post.objects.select_related("author", "group")
+        page_cards(Paginator(posts, 10).get_page(1), "test")
+        page = Paginator(posts, 10).get_page(1)
+        with self.assertNumQueries(0):
+            cards = page_cards(page, "test")
+        self.assertEqual(len(cards), 10)
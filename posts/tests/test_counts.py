@@ -0,0 +1,116 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts import counts
+from posts.models import FeedCounter, Group, Post, User
+from posts.tests.base import FeedTestCase
+from posts.templatetags.pagination import approx_count
+
+
+class FeedCountTests(FeedTestCase):
+    author_name = "count-author"
+    group_title = "Группа"
+    group_slug = "count-group"
+    post_count = 3
+
+    def setUp(self):
+        super().setUp()
+        self.other_group = Group.objects.create(title="Другая", slug="other")
+
+    def assertNotCounted(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+        self.assertFalse(any(
+            "COUNT(" in query["sql"] for query in queries.captured_queries
+        ))
+        return result
+
+    def test_counter_is_maintained_on_write(self):
+        """ После первого подсчета лента больше не считается. """
+        self.assertEqual(counts.global_count(), (3, True))
+        self.assertEqual(counts.group_count(self.group), (3, True))
+        self.assertEqual(counts.author_count(self.author), (3, True))
+        post = Post.objects.create(text="Новый", author=self.author)
+        Post.objects.filter(text="Пост 0").delete()
+        post.group = self.group
+        post.save()
+        self.assertEqual(self.assertNotCounted(counts.global_count).value, 3)
+        self.assertEqual(
+            self.assertNotCounted(
+                lambda: counts.group_count(self.group)
+            ).value, 3
+        )
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(counts.group_count(self.group).value, 2)
+        self.assertEqual(counts.group_count(self.other_group).value, 1)
+
+    def test_post_saved_while_counting_is_not_lost(self):
+        """ Пост, сохраненный во время подсчета, попадает в счетчик. """
+        def count():
+            value = Post.objects.count()
+            Post.objects.create(text="Во время подсчета", author=self.author)
+            return value
+
+        counts.feed_count("index", count, lambda: None)
+        self.assertEqual(counts.global_count().value, 4)
+
+    @override_settings(FEED_COUNTS={"EXACT_LIMIT": 2})
+    def test_large_feed_without_counter_is_estimated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(
+            self.assertNotCounted(counts.global_count), (3, False)
+        )
+        self.assertFalse(FeedCounter.objects.exists())
+
+    def test_rebuild_command(self):
+        FeedCounter.objects.create(name="index", value=100)
+        call_command("rebuild_feed_counters", stdout=StringIO())
+        self.assertEqual(FeedCounter.objects.get(name="index").value, 3)
+        self.assertEqual(
+            FeedCounter.objects.get(name=f"group:{self.group.pk}").value, 3
+        )
+
+    def test_counters_do_not_drift_from_rows(self):
+        """
+        После создания, правки и удаления постов, сообществ и авторов
+        счетчики совпадают с пересчетом rebuild_feed_counters.
+        """
+        other = User.objects.create_user(username="other-author")
+        counts.global_count()
+        counts.author_count(self.author)
+        counts.author_count(other)
+        for group in (self.group, self.other_group):
+            counts.group_count(group)
+        post = Post.objects.create(
+            text="Новый", author=other, group=self.other_group
+        )
+        post.group = None
+        post.save()
+        post.group = self.group
+        post.save()
+        Post.objects.create(text="Еще", author=other, group=self.group)
+        Post.objects.filter(text="Пост 0").delete()
+        self.other_group.delete()
+        other.delete()
+        before = dict(FeedCounter.objects.values_list("name", "value"))
+        call_command("rebuild_feed_counters", stdout=StringIO())
+        after = dict(FeedCounter.objects.values_list("name", "value"))
+        self.assertEqual(
+            before, {name: after.get(name, 0) for name in before}
+        )
+        self.assertEqual(before["index"], 2)
+
+    def test_approximate_count_format(self):
+        self.assertEqual(approx_count(counts.FeedCount(1234, True)), "1234")
+        self.assertEqual(
+            approx_count(counts.FeedCount(1_234_567, False)), "~1.2M"
+        )
+        self.assertEqual(
+            approx_count(counts.FeedCount(35_400, False)), "~35.4K"
+        )
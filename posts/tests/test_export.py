@@ -0,0 +1,90 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from posts.export import export, iter_chunks
+from posts.models import Comment, Follow, User
+from posts.tests.base import FeedTestCase
+
+
+class ExportTests(FeedTestCase):
+    author_name = "export-author"
+    reader_name = "export-reader"
+    group_title = "Выгрузка"
+    group_slug = "export"
+    post_count = 7
+
+    def setUp(self):
+        super().setUp()
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text="Комментарий"
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_keyset_chunks_cover_table_once(self):
+        with self.assertNumQueries(4):
+            chunks = list(iter_chunks("post", chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(
+            [row["id"] for chunk in chunks for row in chunk],
+            sorted(post.id for post in self.posts),
+        )
+
+    def test_jsonl_and_gzip(self):
+        plain = b"".join(export("post", chunk_size=2))
+        packed = b"".join(export("post", compress=True, chunk_size=2))
+        self.assertEqual(gzip.decompress(packed), plain)
+        rows = [json.loads(line) for line in plain.decode().splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]["type"], "post")
+        self.assertEqual(rows[0]["text"], "Пост 0")
+        self.assertEqual(rows[0]["author_id"], self.author.id)
+
+    def test_csv(self):
+        content = b"".join(export("follow", "csv")).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ["id", "user_id", "author_id"])
+        self.assertEqual(
+            rows[1][1:], [str(self.reader.id), str(self.author.id)]
+        )
+
+    def test_command_writes_all_tables(self):
+        handle, path = tempfile.mkstemp(suffix=".jsonl.gz")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command("export", "--gzip", f"--output={path}", stdout=StringIO())
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            kinds = [json.loads(line)["type"] for line in file]
+        self.assertEqual(
+            {kind: kinds.count(kind) for kind in set(kinds)},
+            {"group": 1, "post": 7, "comment": 1, "follow": 1},
+        )
+
+    def test_endpoint_is_staff_only(self):
+        url = reverse("export_table", args=["comment"])
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url, {"format": "csv", "gzip": 1})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertIn("Комментарий", content.decode())
+        response = self.client.get(url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_author_named_export_can_be_followed(self):
+        """ Адрес выгрузки не перекрывает страницы автора export. """
+        author = User.objects.create_user(username="export")
+        self.client.force_login(self.reader)
+        self.client.get(reverse("profile_follow", args=["export"]))
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=author).exists()
+        )
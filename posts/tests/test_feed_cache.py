@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from posts import routers
+from posts.feed_cache import (
+    LOCK_KEY, bump_feed_version, cached_feed, feed_version,
+)
+
+
+class CachedFeedTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        routers.begin_request()
+        self.calls = []
+
+    def tearDown(self):
+        routers.end_request()
+
+    def compute(self, value="fresh", delay=0):
+        def inner():
+            time.sleep(delay)
+            self.calls.append(value)
+            return value
+        return inner
+
+    def test_fresh_entry_is_not_recomputed(self):
+        cached_feed("feed:test", self.compute("first"))
+        self.assertEqual(cached_feed("feed:test", self.compute()), "first")
+        self.assertEqual(self.calls, ["first"])
+
+    def test_stale_entry_is_served_while_other_recomputes(self):
+        """
+        После смены версии лент устаревшая копия отдается сразу,
+        пока ленту пересчитывает другой запрос.
+        """
+        cached_feed("feed:test", self.compute("stale"))
+        bump_feed_version()
+        cache.add(LOCK_KEY.format("feed:test"), 1)
+        self.assertEqual(cached_feed("feed:test", self.compute()), "stale")
+        self.assertEqual(self.calls, ["stale"])
+
+    def test_lock_holder_recomputes_stale_entry(self):
+        cached_feed("feed:test", self.compute("stale"))
+        bump_feed_version()
+        self.assertEqual(cached_feed("feed:test", self.compute()), "fresh")
+
+    def test_pinned_user_never_gets_stale_entry(self):
+        """ Пользователь, который только что писал, видит свежую ленту. """
+        cached_feed("feed:test", self.compute("stale"))
+        bump_feed_version()
+        routers.begin_request(pinned=True)
+        self.assertEqual(cached_feed("feed:test", self.compute()), "fresh")
+
+    def test_concurrent_misses_compute_once(self):
+        """ Параллельные промахи одного ключа ждут одного вычисления. """
+        feed_version()
+        results = []
+
+        def read():
+            results.append(
+                cached_feed("feed:test", self.compute(delay=0.2))
+            )
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["fresh"] * 8)
+        self.assertEqual(self.calls, ["fresh"])
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from posts import fragments
+from posts.cards import build_cards
+from posts.models import Comment, Post, User
+
+
+class PostFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="fragment-author")
+        self.reader = User.objects.create_user(username="fragment-reader")
+        for number in range(3):
+            Post.objects.create(text=f"Пост {number}", author=self.author)
+        self.cards = build_cards(Post.objects.all())
+
+    def test_cached_fragments_are_not_rendered_again(self):
+        """ Вторая страница с теми же постами не рендерит карточек заново. """
+        fragments.render_cards(self.cards)
+        with mock.patch.object(
+            fragments, "render_card_list", wraps=fragments.render_card_list
+        ) as render:
+            fragments.render_cards(self.cards)
+        render.assert_not_called()
+
+    def test_card_list_matches_include(self):
+        """ Однопроходный рендер дает тот же HTML, что и шаблон карточки. """
+        self.assertEqual(
+            fragments.render_card_list(self.cards),
+            [
+                render_to_string("post_item.html", {"post": card})
+                for card in self.cards
+            ],
+        )
+
+    def test_fragments_are_read_with_one_get_many(self):
+        with mock.patch.object(
+            fragments.cache, "get_many", wraps=fragments.cache.get_many
+        ) as get_many:
+            fragments.render_cards(self.cards)
+        get_many.assert_called_once()
+
+    def test_fragment_does_not_depend_on_user(self):
+        """ Кнопка редактирования оставлена меткой для posts.holes. """
+        html = fragments.render_cards(self.cards)
+        marker = f"<!--hole:edit fragment-author {self.cards[0].id}-->"
+        self.assertIn(marker, html)
+        self.assertNotIn("Редактировать", html)
+
+    def test_comment_changes_post_version(self):
+        """ Новый комментарий дает посту новый ключ фрагмента. """
+        post = Post.objects.get(id=self.cards[0].id)
+        Comment.objects.create(post=post, author=self.reader, text="Да")
+        card = build_cards([post])[0]
+        self.assertNotEqual(
+            fragments.fragment_key(card), fragments.fragment_key(self.cards[0])
+        )
+        self.assertIn("Комментариев: 1", fragments.render_cards([card]))
@@ -0,0 +1,97 @@
+import threading
+
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts.group_commit import (GroupCommitQueue, get_queue, run_write,
+                                write_alias)
+from posts.models import Comment, Follow, Post, User
+
+
+class GroupCommitQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="test-author")
+        self.post = Post.objects.create(
+            author=self.author,
+            text="Это тестовый текст.",
+        )
+        self.commit_queue = GroupCommitQueue(max_delay=0.05)
+
+    def tearDown(self):
+        connection.close()
+
+    def test_concurrent_writes_are_batched(self):
+        """
+        Проверяет, что записи параллельных потоков фиксируются
+        меньшим числом транзакций, и каждая из них видна сразу.
+        """
+        visible = []
+
+        def add_comment(number):
+            comment = self.commit_queue.run(
+                Comment.objects.create,
+                post=self.post,
+                author=self.author,
+                text=f"Комментарий {number}",
+            )
+            # Вызывающий поток видит свою запись сразу после возврата.
+            visible.append(Comment.objects.filter(id=comment.id).exists())
+            connection.close()
+
+        threads = [
+            threading.Thread(target=add_comment, args=(number,))
+            for number in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertEqual(visible, [True] * 20)
+        self.assertLess(self.commit_queue.batches_committed, 20)
+
+    def test_failed_write_does_not_roll_back_batch(self):
+        """ Ошибка одной записи не откатывает остальные записи пачки. """
+        follower = User.objects.create_user(username="test-follower")
+        Follow.objects.create(user=follower, author=self.author)
+        duplicate = self.commit_queue.submit(
+            Follow.objects.create, user=follower, author=self.author
+        )
+        comment = self.commit_queue.submit(
+            Comment.objects.create,
+            post=self.post,
+            author=follower,
+            text="Комментарий",
+        )
+        with self.assertRaises(IntegrityError):
+            duplicate.result()
+        self.assertTrue(Comment.objects.filter(id=comment.result().id))
+        self.assertEqual(Follow.objects.count(), 1)
+
+
+class RunWriteTests(TestCase):
+    @override_settings(GROUP_COMMIT={"ENABLED": True})
+    def test_write_inside_transaction_runs_inline(self):
+        """
+        Внутри открытой транзакции запись выполняется сразу,
+        без передачи в поток очереди.
+        """
+        author = User.objects.create_user(username="test-author")
+        post = run_write(Post.objects.create, author=author, text="Текст")
+        self.assertTrue(Post.objects.filter(id=post.id).exists())
+
+    @override_settings(DATABASES={
+        alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+        for alias in ("default", "social", "comments")
+    })
+    def test_writes_are_queued_per_database(self):
+        """
+        С отдельными базами подсистем пачка открывается в той базе,
+        куда уйдет запись, а не в основной.
+        """
+        self.assertEqual(write_alias(Comment), "comments")
+        self.assertEqual(
+            write_alias(Follow(user_id=1, author_id=2)), "social"
+        )
+        self.assertEqual(get_queue("comments").using, "comments")
+        self.assertIsNot(get_queue("comments"), get_queue("default"))
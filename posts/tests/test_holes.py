@@ -0,0 +1,69 @@
+import re
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from posts import views
+from posts.models import Post, User
+
+
+@override_settings(SHELL_CACHE={"ENABLED": True, "TIMEOUT": 60})
+class ShellCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="shell-author")
+        self.reader = User.objects.create_user(username="shell-reader")
+        self.post = Post.objects.create(text="Пост", author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client(enforce_csrf_checks=True)
+        self.reader_client.force_login(self.reader)
+
+    def test_users_share_one_shell(self):
+        """ После первого запроса страницу никто не рендерит заново. """
+        self.client.get("/")
+        with mock.patch.object(views, "render") as render:
+            self.author_client.get("/")
+            self.reader_client.get("/")
+        render.assert_not_called()
+
+    def test_holes_are_filled_per_user(self):
+        self.client.get("/")
+        anonymous = self.client.get("/").content.decode()
+        author = self.author_client.get("/").content.decode()
+        reader = self.reader_client.get("/").content.decode()
+        edit_url = f"/shell-author/{self.post.id}/edit/"
+        self.assertIn("Войти", anonymous)
+        self.assertNotIn("Избранные авторы", anonymous)
+        self.assertIn("Пользователь: shell-author.", author)
+        self.assertIn(edit_url, author)
+        self.assertIn("Пользователь: shell-reader.", reader)
+        self.assertIn("Избранные авторы", reader)
+        self.assertNotIn(edit_url, reader)
+        self.assertNotIn("<!--hole:", reader)
+
+    def test_follow_button_is_personal(self):
+        profile_url = "/shell-author/"
+        self.author_client.get(profile_url)
+        self.assertIn(
+            "Подписаться", self.reader_client.get(profile_url).content.decode()
+        )
+        self.assertNotIn(
+            "Подписаться", self.author_client.get(profile_url).content.decode()
+        )
+
+    def test_comment_form_from_cached_shell_passes_csrf(self):
+        """ Токен из метки в закешированной странице принимается формой. """
+        post_url = f"/shell-author/{self.post.id}/"
+        self.client.get(post_url)
+        content = self.reader_client.get(post_url).content.decode()
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="(\w+)"', content
+        )[1]
+        response = self.reader_client.post(
+            f"{post_url}comment/",
+            {"text": "Комментарий", "csrfmiddlewaretoken": token},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.post.comments.count(), 1)
@@ -0,0 +1,98 @@
+import datetime as dt
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import counts
+from posts.models import Comment, FeedCounter, Follow, Group, Post, User
+
+ROWS = [
+    {"type": "group", "slug": "imported", "title": "Импорт"},
+    {"type": "post", "id": "p1", "author": "reader", "group": "imported",
+     "text": "Первый\nпост", "pub_date": "2015-03-01T10:00:00+00:00"},
+    {"type": "post", "id": "p2", "author": "newcomer", "text": "Второй",
+     "pub_date": "2015-03-02T10:00:00"},
+    {"type": "comment", "post": "p1", "author": "newcomer",
+     "text": "<b>Комментарий</b>", "created": "2015-03-03T10:00:00+00:00"},
+    {"type": "comment", "post": "unknown", "author": "reader", "text": "?"},
+    {"type": "post", "id": "p3", "author": "stranger", "group": "missing",
+     "text": "Без сообщества"},
+    {"type": "comment", "post": "p3", "author": "reader", "text": "?"},
+    {"type": "follow", "user": "reader", "author": "newcomer"},
+    {"type": "follow", "user": "reader", "author": "newcomer"},
+]
+
+
+class ImportJsonlTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader")
+        Post.objects.create(text="Старый пост", author=self.reader)
+        # Счетчик ленты уже создан: импорт должен его пересчитать.
+        self.assertEqual(counts.global_count().value, 1)
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(row) + "\n" for row in ROWS)
+        self.addCleanup(os.remove, self.path)
+
+    def run_import(self):
+        out = StringIO()
+        call_command("import_jsonl", self.path, "--batch-size=2", stdout=out)
+        return out.getvalue()
+
+    def test_rows_are_loaded(self):
+        output = self.run_import()
+        self.assertIn("строк/с", output)
+        newcomer = User.objects.get(username="newcomer")
+        self.assertFalse(newcomer.has_usable_password())
+        first = Post.objects.get(text="Первый\nпост")
+        self.assertEqual(first.author, self.reader)
+        self.assertEqual(first.group, Group.objects.get(slug="imported"))
+        self.assertEqual(first.text_html, "Первый<br>пост")
+        self.assertEqual(
+            first.pub_date, dt.datetime(2015, 3, 1, 10, tzinfo=timezone.utc)
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, first)
+        self.assertEqual(comment.author, newcomer)
+        self.assertEqual(comment.text_html, "&lt;b&gt;Комментарий&lt;/b&gt;")
+        self.assertEqual(comment.created.year, 2015)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_post_of_unknown_group_is_skipped(self):
+        output = self.run_import()
+        self.assertIn("пропущено post: 1", output)
+        self.assertIn("пропущено comment: 2", output)
+        self.assertFalse(Post.objects.filter(text="Без сообщества").exists())
+        self.assertFalse(User.objects.filter(username="stranger").exists())
+
+    def test_counters_are_rebuilt(self):
+        self.run_import()
+        self.assertEqual(
+            FeedCounter.objects.get(name="index").value, Post.objects.count()
+        )
+        group = Group.objects.get(slug="imported")
+        self.assertEqual(counts.group_count(group), (1, True))
+
+    def test_existing_rows_are_kept(self):
+        self.run_import()
+        self.run_import()
+        self.assertEqual(Group.objects.filter(slug="imported").count(), 1)
+        self.assertEqual(User.objects.filter(username="newcomer").count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_missing_field_names_the_line(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"type": "post", "author": "reader"}))
+        with self.assertRaisesMessage(
+                CommandError, f"{self.path}:{len(ROWS) + 1}: у post нет "
+                              f"поля 'text'"):
+            self.run_import()
@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import counts, jobs, routers
+from posts.models import BackgroundJob, Comment, Group, Post, User
+
+
+@override_settings(BACKGROUND_JOBS={"EAGER": True, "BATCH": 2})
+class AdminJobTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="moderator", email="moderator@example.com",
+            password="moderator",
+        )
+        self.client.force_login(self.admin)
+        self.spammer = User.objects.create_user(username="spammer")
+        self.source = Group.objects.create(title="Откуда", slug="source")
+        self.target = Group.objects.create(title="Куда", slug="target")
+        self.posts = [
+            Post.objects.create(
+                text=f"Пост {number}", author=self.spammer,
+                group=self.source,
+            )
+            for number in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(
+                post=post, author=self.spammer, text="Спам"
+            )
+        # Счетчики лент уже созданы: задачи должны их поправить.
+        counts.global_count()
+        counts.group_count(self.source)
+        counts.group_count(self.target)
+
+    def act(self, model, action, queryset, **data):
+        with mock.patch(
+            "posts.jobs.bump_feed_version", wraps=jobs.bump_feed_version
+        ) as bump:
+            response = self.client.post(
+                reverse(f"admin:posts_{model}_changelist"),
+                {"action": action,
+                 "_selected_action": [obj.pk for obj in queryset],
+                 **data},
+                follow=True,
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, bump
+
+    def test_move_to_group(self):
+        response, bump = self.act(
+            "post", "move_to_group", self.posts[:4], group=self.target.pk
+        )
+        self.assertContains(response, "поставлена в очередь")
+        self.assertEqual(self.target.posts.count(), 4)
+        self.assertEqual(counts.group_count(self.source).value, 1)
+        self.assertEqual(counts.group_count(self.target).value, 4)
+        # Пачки по 2 поста: кеш лент сбрасывается один раз на пачку.
+        self.assertEqual(bump.call_count, 2)
+        background_job = BackgroundJob.objects.get()
+        self.assertEqual(background_job.status, BackgroundJob.DONE)
+        self.assertEqual(
+            (background_job.done, background_job.total), (4, 4)
+        )
+
+    def test_move_to_deleted_group_is_rejected(self):
+        Group.objects.filter(pk=self.target.pk).update(is_deleted=True)
+        response = self.client.get(reverse("admin:posts_post_changelist"))
+        choices = response.context["action_form"].fields["group"].choices
+        self.assertNotIn(self.target.pk, [value for value, _ in choices])
+        self.act(
+            "post", "move_to_group", self.posts[:4], group=self.target.pk
+        )
+        self.assertFalse(BackgroundJob.objects.exists())
+        self.assertFalse(self.target.posts.exists())
+
+    def test_move_needs_group(self):
+        response, _ = self.act("post", "move_to_group", self.posts)
+        self.assertContains(response, "Выберите сообщество")
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_delete_posts_in_batches(self):
+        response = self.client.get(reverse("admin:posts_post_changelist"))
+        actions = response.context["action_form"].fields["action"].choices
+        self.assertNotIn("delete_selected", dict(actions))
+        _, bump = self.act("post", "delete_in_batches", self.posts[:3])
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(counts.global_count().value, 2)
+        self.assertEqual(counts.group_count(self.source).value, 2)
+        self.assertEqual(bump.call_count, 2)
+
+    def test_delete_author_comments(self):
+        self.act(
+            "comment", "delete_author_comments", Comment.objects.all()[:1]
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(BackgroundJob.objects.get().total, 5)
+
+    def test_strip_images(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=media_root):
+            path = default_storage.save("posts/spam.gif", ContentFile(b"1"))
+            Post.objects.filter(pk=self.posts[0].pk).update(image=path)
+            self.act("post", "strip_images", self.posts)
+            self.assertFalse(default_storage.exists(path))
+        self.assertFalse(Post.objects.filter(image__gt="").exists())
+
+    def test_failed_job_is_reported(self):
+        with mock.patch.dict(jobs._jobs, {"delete_post": mock.Mock(
+                side_effect=RuntimeError("сбой"))}):
+            self.act("post", "delete_in_batches", self.posts)
+        background_job = BackgroundJob.objects.get()
+        self.assertEqual(background_job.status, BackgroundJob.FAILED)
+        self.assertIn("сбой", background_job.error)
+
+
+class RunJobsCommandTests(TestCase):
+    @override_settings(BACKGROUND_JOBS={"EAGER": False, "BATCH": 10})
+    def test_pending_jobs_are_run(self):
+        author = User.objects.create_user(username="queued")
+        Post.objects.create(text="Пост", author=author)
+        jobs.enqueue("delete_post", Post.objects.all())
+        # Вне TestCase задачу запустил бы поток после фиксации транзакции.
+        background_job = BackgroundJob.objects.get()
+        self.assertEqual(background_job.status, BackgroundJob.PENDING)
+        call_command("run_jobs", stdout=StringIO())
+        background_job.refresh_from_db()
+        self.assertEqual(background_job.status, BackgroundJob.DONE)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(BACKGROUND_JOBS={"EAGER": False, "BATCH": 2})
+    def test_job_keeps_selected_rows(self):
+        """
+        Задача хранит id выбранных строк: пост, созданный после
+        постановки в очередь, она не трогает.
+        """
+        author = User.objects.create_user(username="queued")
+        for number in range(3):
+            Post.objects.create(text=f"Пост {number}", author=author)
+        background_job = jobs.enqueue("delete_post", Post.objects.all())
+        late = Post.objects.create(text="Поздний пост", author=author)
+        call_command("run_jobs", stdout=StringIO())
+        background_job.refresh_from_db()
+        self.assertEqual(
+            (background_job.done, background_job.total), (3, 3)
+        )
+        self.assertEqual(list(Post.objects.all()), [late])
+
+
+@override_settings(
+    BACKGROUND_JOBS={"EAGER": True, "BATCH": 10},
+    DATABASE_REPLICAS=["replica"],
+)
+class ReplicaJobTests(TestCase):
+    databases = {"default", "replica"}
+
+    def test_job_is_read_from_primary(self):
+        """
+        Задача, только что поставленная в очередь, читается из основной
+        базы: в реплике ее еще нет.
+        """
+        author = User.objects.create_user(username="queued")
+        group = Group.objects.create(title="Куда", slug="target")
+        Post.objects.create(text="Пост", author=author)
+        # Запрос без записи постов не закреплен за основной базой.
+        routers.begin_request()
+        self.addCleanup(routers.end_request)
+        background_job = jobs.enqueue(
+            "move_posts", Post.objects.all(), group_id=group.pk
+        )
+        background_job.refresh_from_db()
+        self.assertEqual(background_job.status, BackgroundJob.DONE)
+        self.assertTrue(
+            Post.objects.using("default").filter(group=group).exists()
+        )
@@ -1,4 +1,4 @@
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from posts.models import Comment, Follow, Post, Group, User
 
@@ -46,6 +46,21 @@ class PostModelTest(TestCase):
         expected_object_value = ("Это тестовый текст."*10)[:15]
         self.assertEqual(expected_object_value, str(post))
 
+    def test_text_html_is_rendered_on_save(self):
+        post = Post.objects.create(
+            author=PostModelTest.post.author, text="<b>Раз</b>\nДва"
+        )
+        self.assertEqual(post.text_html, "&lt;b&gt;Раз&lt;/b&gt;<br>Два")
+        self.assertEqual(post.excerpt_html, post.text_html)
+        self.assertFalse(post.is_truncated)
+
+    @override_settings(POST_EXCERPT_LENGTH=20)
+    def test_excerpt_is_cut_for_long_text(self):
+        post = PostModelTest.post
+        post.save()
+        self.assertEqual(post.excerpt_html, "Это тестовый текст.…")
+        self.assertTrue(post.is_truncated)
+
 
 class GroupModelTest(TestCase):
     @classmethod
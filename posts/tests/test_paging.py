@@ -0,0 +1,71 @@
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.counts import FeedCount
+from posts.models import Post, User
+from posts.paging import page_window, paginate
+
+
+class PageWindowTests(TestCase):
+    def window(self, number, count=500):
+        paginator = Paginator(range(count), 10)
+        paginator.count_is_exact = True
+        return page_window(paginator.page(number))
+
+    def test_window_around_current_page(self):
+        self.assertEqual(
+            self.window(25), [1, None, 23, 24, 25, 26, 27, None, 50]
+        )
+
+    def test_window_near_edges(self):
+        self.assertEqual(self.window(2), [1, 2, 3, 4, None, 50])
+        self.assertEqual(self.window(49), [1, None, 47, 48, 49, 50])
+
+    def test_short_feed_shows_all_pages(self):
+        self.assertEqual(self.window(1, count=30), [1, 2, 3])
+
+
+@override_settings(PAGINATION={"WINDOW": 2, "ENDS": 1, "EXACT_COUNT": False})
+class SkipCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username="paging-author")
+        for number in range(25):
+            Post.objects.create(text=f"Пост {number}", author=author)
+
+    def test_feed_is_not_counted(self):
+        with CaptureQueriesContext(connection) as queries:
+            paginator, page = paginate(Post.objects.all(), "2")
+            posts = list(page)
+        self.assertEqual(len(posts), 10)
+        self.assertTrue(page.has_next())
+        self.assertFalse(paginator.count_is_exact)
+        self.assertFalse(any(
+            "COUNT(" in query["sql"] for query in queries.captured_queries
+        ))
+
+    def test_unknown_tail_is_elided(self):
+        """ Без точного счета последняя страница неизвестна. """
+        paginator, page = paginate(Post.objects.all(), "1")
+        self.assertEqual(page_window(page), [1, 2, None])
+
+    def test_last_page_has_no_next(self):
+        paginator, page = paginate(Post.objects.all(), "3")
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+
+    def test_page_past_the_end_falls_back_to_last_page(self):
+        paginator, page = paginate(Post.objects.all(), "40")
+        self.assertEqual(page.number, 3)
+
+    def test_estimate_does_not_limit_pages(self):
+        """ Страницы за заниженной оценкой числа постов доступны. """
+        estimate = FeedCount(12, False)
+        paginator, page = paginate(Post.objects.all(), "2", count=estimate)
+        self.assertTrue(page.has_next())
+        self.assertFalse(paginator.count_is_exact)
+        paginator, page = paginate(Post.objects.all(), "3", count=estimate)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
@@ -0,0 +1,143 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.core.management import call_command
+from django.db import router
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import routers
+from posts.models import Comment, Follow, Post, User
+
+SPLIT_DATABASES = {
+    alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+    for alias in ("default", "sessions", "social", "comments")
+}
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers.begin_request()
+
+    def tearDown(self):
+        routers.end_request()
+
+    def test_posts_reads_go_to_replica(self):
+        """ Чтение постов уходит на реплику. """
+        self.assertEqual(self.router.db_for_read(Post), "replica")
+
+    def test_auth_reads_stay_on_primary(self):
+        """ Чтение пользователей и сессий остается на основной базе. """
+        self.assertIsNone(self.router.db_for_read(AuthUser))
+
+    def test_write_pins_request_to_primary(self):
+        """ После записи запрос дочитывает данные из основной базы. """
+        author = User.objects.create_user(username="writer")
+        Post.objects.using("default").create(author=author, text="Текст")
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_resolving_write_alias_does_not_pin(self):
+        """ Выбор базы для записи без самой записи не закрепляет запрос. """
+        self.assertEqual(router.db_for_write(Post), "default")
+        self.assertEqual(self.router.db_for_read(Post), "replica")
+
+    def test_pinned_request_reads_primary(self):
+        """ Закрепленный пользователь читает из основной базы. """
+        routers.begin_request(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_replicas_are_not_migrated(self):
+        """ На репликах миграции не выполняются. """
+        self.assertFalse(self.router.allow_migrate("replica", "posts"))
+        self.assertIsNone(self.router.allow_migrate("default", "posts"))
+
+
+@override_settings(DATABASES=SPLIT_DATABASES)
+class SubsystemRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.SubsystemRouter()
+
+    def test_hot_models_go_to_own_database(self):
+        """ Подписки и комментарии читаются и пишутся в свои базы. """
+        self.assertEqual(self.router.db_for_write(Follow), "social")
+        self.assertEqual(self.router.db_for_read(Comment), "comments")
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_related_objects_are_read_from_default(self):
+        """ Автор комментария читается из основной базы. """
+        comment = Comment()
+        comment._state.db = "comments"
+        self.assertEqual(
+            self.router.db_for_read(AuthUser, instance=comment), "default"
+        )
+
+    def test_migrations_are_split(self):
+        """ В отдельной базе создаются только таблицы ее моделей. """
+        self.assertTrue(
+            self.router.allow_migrate("social", "posts", model_name="follow")
+        )
+        self.assertFalse(
+            self.router.allow_migrate("social", "posts", model_name="post")
+        )
+        self.assertIsNone(
+            self.router.allow_migrate("default", "posts", model_name="post")
+        )
+
+    @override_settings(DATABASES={"default": SPLIT_DATABASES["default"]})
+    def test_unconfigured_alias_is_ignored(self):
+        """ Без описания базы в DATABASES модель остается в основной. """
+        self.assertIsNone(self.router.db_for_write(Follow))
+
+
+class PrimaryPinningMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="test-author")
+        cls.post = Post.objects.create(author=cls.author, text="Текст")
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_write_sets_pin_cookie(self):
+        """ После комментария пользователь закрепляется за основной базой. """
+        response = self.authorized_client.post(
+            reverse(
+                "add_comment",
+                kwargs={"username": "test-author", "post_id": self.post.id},
+            ),
+            data={"text": "Комментарий"},
+        )
+        cookie = response.cookies.get(settings.REPLICA_PIN_COOKIE)
+        self.assertIsNotNone(cookie)
+        self.assertEqual(cookie["max-age"], settings.REPLICA_PIN_SECONDS)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_read_does_not_set_pin_cookie(self):
+        """ Чтение ленты не закрепляет пользователя за основной базой. """
+        response = self.authorized_client.get(reverse("index"))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class SnapshotReplicaTests(TransactionTestCase):
+    # Снимок заменяет базу реплики целиком, поэтому без транзакции теста.
+    databases = {"default", "replica"}
+
+    def test_snapshot_copies_primary_to_replica(self):
+        author = User.objects.create_user(username="snapshot")
+        Post.objects.create(author=author, text="Снимок")
+        self.assertFalse(Post.objects.using("replica").exists())
+        call_command("snapshot_replica", "replica", stdout=StringIO())
+        routers.begin_request()
+        self.addCleanup(routers.end_request)
+        self.assertEqual(
+            list(Post.objects.values_list("text", flat=True)), ["Снимок"]
+        )
+        self.assertEqual(Post.objects.all().db, "replica")
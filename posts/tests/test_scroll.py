@@ -0,0 +1,99 @@
+import re
+from unittest import mock
+
+from posts.models import Follow
+from posts.tests.base import FeedTestCase
+
+
+class FeedCardsTests(FeedTestCase):
+    author_name = "scroll-author"
+    reader_name = "scroll-reader"
+    group_title = "Лента"
+    group_slug = "scroll"
+    post_count = 25
+
+    def scroll(self, feed):
+        """ Проходит ленту до конца, возвращает id постов и ответы. """
+        ids, responses, cursor = [], [], ""
+        while True:
+            response = self.client.get(
+                "/feed/cards/", {"feed": feed, "cursor": cursor}
+            )
+            self.assertEqual(response.status_code, 200)
+            responses.append(response)
+            ids += map(int, re.findall(
+                r'name="post_(\d+)"', response.content.decode()
+            ))
+            cursor = response["X-Next-Cursor"]
+            if not cursor:
+                return ids, responses
+
+    def test_cursor_walks_whole_feed_once(self):
+        ids, responses = self.scroll("index")
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(responses), 3)
+
+    def test_group_and_follow_feeds(self):
+        ids, _ = self.scroll("group:scroll")
+        self.assertEqual(len(ids), 25)
+        self.client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        ids, _ = self.scroll("follow")
+        self.assertEqual(len(ids), 25)
+
+    def test_only_first_batch_is_cached(self):
+        """ Порции после курсора не заводят записей в кеше. """
+        cursor = self.client.get(
+            "/feed/cards/", {"feed": "index"}
+        )["X-Next-Cursor"]
+        with mock.patch("posts.feed_cache.cached_feed") as cached_feed:
+            for same_cursor in (cursor, "0" + cursor):
+                response = self.client.get(
+                    "/feed/cards/", {"feed": "index", "cursor": same_cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+        cached_feed.assert_not_called()
+
+    def test_unchanged_cards_are_not_modified(self):
+        response = self.client.get("/feed/cards/", {"feed": "index"})
+        response = self.client.get(
+            "/feed/cards/", {"feed": "index"},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(response["X-Next-Cursor"])
+
+    def test_new_comment_changes_etag(self):
+        etag = self.client.get("/feed/cards/", {"feed": "index"})["ETag"]
+        self.posts[-1].comments.create(author=self.reader, text="Новый")
+        response = self.client.get(
+            "/feed/cards/", {"feed": "index"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_fragment_is_much_smaller_than_page(self):
+        page = self.client.get("/", {"page": 2})
+        fragment = self.client.get(
+            "/feed/cards/",
+            {"feed": "index", "cursor": self.client.get(
+                "/feed/cards/", {"feed": "index"}
+            )["X-Next-Cursor"]},
+        )
+        self.assertNotIn(b"<nav", fragment.content)
+        self.assertLess(len(fragment.content), len(page.content) * 0.8)
+
+    def test_bad_requests(self):
+        response = self.client.get(
+            "/feed/cards/", {"feed": "index", "cursor": "oops"}
+        )
+        self.assertEqual(response.status_code, 400)
+        for cursor in ("99999999999999999999-1", "1-99999999999999999999"):
+            response = self.client.get(
+                "/feed/cards/", {"feed": "index", "cursor": cursor}
+            )
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get("/feed/cards/", {"feed": "follow"})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/feed/cards/", {"feed": "nothing"})
+        self.assertEqual(response.status_code, 404)
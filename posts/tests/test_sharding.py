@@ -0,0 +1,199 @@
+import datetime as dt
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counts, sharding
+from posts.models import AuthorShard, Comment, Group, Post, User
+from posts.routers import ShardRouter
+
+SHARDED_DATABASES = {
+    alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+    for alias in ("default", "shard0", "shard1")
+}
+
+
+@override_settings(
+    DATABASES=SHARDED_DATABASES, POST_SHARDS=["shard0", "shard1"]
+)
+class ShardMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ShardRouter()
+
+    def test_shard_is_computed_from_author_id(self):
+        """ Шард без закрепления вычисляется по id автора. """
+        self.assertEqual(sharding.shard_for_author(4), "shard0")
+        self.assertEqual(sharding.shard_for_author(7), "shard1")
+
+    def test_assignment_overrides_computed_shard(self):
+        """ Закрепление автора за шардом важнее вычисленного шарда. """
+        author = User.objects.create_user(username="test-author")
+        computed = sharding.shard_for_author(author.pk)
+        other = "shard1" if computed == "shard0" else "shard0"
+        sharding.assign_shard(author.pk, other)
+        self.assertEqual(sharding.shard_for_author(author.pk), other)
+        self.assertTrue(AuthorShard.objects.filter(alias=other).exists())
+
+    def test_router_sends_author_posts_to_one_shard(self):
+        """ Новый пост и посты автора маршрутизируются в шард автора. """
+        self.assertEqual(
+            self.router.db_for_write(Post, instance=Post(author_id=3)),
+            "shard1",
+        )
+        self.assertEqual(
+            self.router.db_for_read(Post, instance=User(pk=3)), "shard1"
+        )
+
+    def test_related_objects_of_sharded_post_come_from_default(self):
+        """ Автор и сообщество поста из шарда читаются из основной базы. """
+        post = Post(author_id=3)
+        post._state.db = "shard1"
+        self.assertEqual(
+            self.router.db_for_read(Group, instance=post), "default"
+        )
+
+    def test_only_sharded_models_migrate_to_shards(self):
+        self.assertTrue(
+            self.router.allow_migrate("shard0", "posts", model_name="post")
+        )
+        self.assertFalse(
+            self.router.allow_migrate("shard0", "posts", model_name="group")
+        )
+
+
+class ScatterGatherFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        now = timezone.now()
+        for number, username in enumerate(("first", "second", "first",
+                                           "second", "second", "first")):
+            author, _ = User.objects.get_or_create(username=username)
+            post = Post.objects.create(author=author, text=f"Пост {number}")
+            Post.objects.filter(id=post.id).update(
+                pub_date=now - dt.timedelta(minutes=number)
+            )
+        # Посты разных авторов изображают два шарда.
+        cls.feed = sharding.ScatterGatherFeed([
+            Post.objects.filter(author__username="first"),
+            Post.objects.filter(author__username="second"),
+        ])
+
+    def test_count_sums_all_sources(self):
+        self.assertEqual(ScatterGatherFeedTests.feed.count(), 6)
+
+    def test_slices_are_merged_by_pub_date(self):
+        """ Срез ленты сливается из всех источников по дате публикации. """
+        feed = ScatterGatherFeedTests.feed
+        self.assertEqual(
+            [post.text for post in feed[0:4]],
+            ["Пост 0", "Пост 1", "Пост 2", "Пост 3"],
+        )
+        self.assertEqual(
+            [post.text for post in feed[4:10]], ["Пост 4", "Пост 5"]
+        )
+        self.assertEqual(feed[1].text, "Пост 1")
+
+
+@override_settings(POST_SHARDS=["shard0", "shard1"])
+class ShardedWriteTests(TestCase):
+    databases = {"default", "shard0", "shard1"}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username="sharded")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(title="Старое", slug="old")
+        self.other_group = Group.objects.create(title="Новое", slug="new")
+        self.source = sharding.shard_for_author(self.author.pk)
+        self.target = "shard1" if self.source == "shard0" else "shard0"
+        self.post = Post.objects.create(
+            text="Пост", author=self.author, group=self.group
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.reader, text="Комментарий"
+        )
+
+    def post_url(self, name="post"):
+        return reverse(
+            name, kwargs={"username": "sharded", "post_id": self.post.pk}
+        )
+
+    def rows(self, model, database):
+        return list(
+            model.objects.using(database).values_list("pk", flat=True)
+        )
+
+    def move(self):
+        call_command(
+            "move_author_shard", "sharded", self.target, stdout=StringIO()
+        )
+
+    def test_posts_and_comments_are_written_to_author_shard(self):
+        """ Посты, их правки и комментарии пишутся в шард автора. """
+        self.client.force_login(self.author)
+        self.client.post(reverse("new_post"), {"text": "Второй пост"})
+        self.client.post(
+            self.post_url("post_edit"),
+            {"text": "Исправлено", "group": self.other_group.pk},
+        )
+        self.client.post(self.post_url("add_comment"), {"text": "Ответ"})
+        self.assertEqual(
+            sorted(Post.objects.using(self.source).values_list(
+                "text", flat=True
+            )),
+            ["Второй пост", "Исправлено"],
+        )
+        self.assertEqual(len(self.rows(Comment, self.source)), 2)
+        for database in ("default", self.target):
+            self.assertEqual(self.rows(Post, database), [])
+            self.assertEqual(self.rows(Comment, database), [])
+
+    def test_move_author_to_other_shard(self):
+        self.move()
+        self.assertEqual(
+            sharding.shard_for_author(self.author.pk), self.target
+        )
+        self.assertEqual(self.rows(Post, self.target), [self.post.pk])
+        self.assertEqual(self.rows(Comment, self.target), [self.comment.pk])
+        self.assertEqual(self.rows(Post, self.source), [])
+        self.assertEqual(self.rows(Comment, self.source), [])
+        response = self.client.get(self.post_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [comment.text for comment in response.context["comments"]],
+            ["Комментарий"],
+        )
+
+    def test_edit_during_move_is_counted_once(self):
+        """
+        Правка поста в старом шарде во время переноса сдвигает
+        счетчики сообществ один раз: догоняющий проход их не трогает.
+        """
+        self.assertEqual(counts.group_count(self.group).value, 1)
+        self.assertEqual(counts.group_count(self.other_group).value, 0)
+        assign_shard = sharding.assign_shard
+
+        def edit_then_assign(author_id, alias):
+            post = Post.objects.using(self.source).get(pk=self.post.pk)
+            post.group = self.other_group
+            post.save()
+            assign_shard(author_id, alias)
+
+        with mock.patch(
+            "posts.sharding.assign_shard", side_effect=edit_then_assign
+        ):
+            self.move()
+        self.assertEqual(
+            Post.objects.using(self.target).get(pk=self.post.pk).group,
+            self.other_group,
+        )
+        self.assertEqual(counts.group_count(self.group).value, 0)
+        self.assertEqual(counts.group_count(self.other_group).value, 1)
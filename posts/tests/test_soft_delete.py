@@ -0,0 +1,191 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counts, feeds, jobs
+from posts.models import (BackgroundJob, Comment, DeletedAuthor,
+                          FeedCounter, Follow, Group, Post, User)
+from posts.tests.base import FeedTestCase
+
+
+@override_settings(BACKGROUND_JOBS={"EAGER": False, "BATCH": 2})
+class SoftDeleteTests(FeedTestCase):
+    author_name = "leaving"
+    reader_name = "staying"
+    group_title = "Закрытое"
+    group_slug = "closed"
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            username="root", email="root@example.com", password="root"
+        )
+        self.reader_post = Post.objects.create(
+            text="Пост читателя", author=self.reader, group=self.group
+        )
+        Comment.objects.create(
+            post=self.reader_post, author=self.author, text="Уходя, скажу"
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+
+    def delete_in_admin(self, obj):
+        opts = obj._meta
+        url = reverse(
+            f"admin:{opts.app_label}_{opts.model_name}_delete",
+            args=[obj.pk],
+        )
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        # Страница подтверждения не загружает посты и комментарии.
+        self.assertFalse(any(
+            "posts_post" in query["sql"] or "posts_comment" in query["sql"]
+            for query in queries.captured_queries
+        ))
+        self.client.post(url, {"post": "yes"})
+        self.client.logout()
+        return BackgroundJob.objects.get()
+
+    def test_deleting_user_needs_permission_for_their_posts(self):
+        """
+        Без права удалять посты и комментарии нельзя удалить
+        и пользователя, чьи посты и комментарии сотрет задача.
+        """
+        moderator = User.objects.create_user(
+            username="moderator", is_staff=True
+        )
+        moderator.user_permissions.set(Permission.objects.filter(
+            codename__in=["view_user", "delete_user"]
+        ))
+        self.client.force_login(moderator)
+        response = self.client.post(
+            reverse("admin:auth_user_delete", args=[self.author.pk]),
+            {"post": "yes"},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(BackgroundJob.objects.exists())
+        self.assertTrue(User.objects.get(username="leaving").is_active)
+
+    def test_group_is_hidden_then_purged(self):
+        self.delete_in_admin(self.group)
+        self.assertEqual(
+            self.client.get(reverse("group_url", args=["closed"])).status_code,
+            404,
+        )
+        response = self.client.get(reverse("index"))
+        self.assertEqual(len(response.context["cards"]), 6)
+        self.assertNotContains(response, "/group/closed/")
+        counts.group_count(self.group)
+
+        call_command("run_jobs", stdout=StringIO())
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 6)
+        self.assertFalse(
+            FeedCounter.objects.filter(name=f"group:{self.group.pk}").exists()
+        )
+
+    def test_user_is_hidden_then_purged(self):
+        self.delete_in_admin(self.author)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertEqual(
+            self.client.get(reverse("profile", args=["leaving"])).status_code,
+            404,
+        )
+        response = self.client.get(reverse("index"))
+        self.assertEqual(
+            [card.id for card in response.context["cards"]],
+            [self.reader_post.id],
+        )
+        # Пока посты не стерты, счетчик ленты больше числа видимых постов.
+        self.assertFalse(response.context["post_count"].exact)
+        self.assertFalse(response.context["paginator"].count_is_exact)
+        self.assertEqual(response.context["paginator"].num_pages, 1)
+        self.client.force_login(self.reader)
+        response = self.client.get(
+            reverse("post", args=["staying", self.reader_post.id])
+        )
+        self.assertEqual(len(response.context["comments"]), 0)
+        self.assertEqual(len(self.client.get(
+            reverse("follow_index")
+        ).context["cards"]), 0)
+
+        call_command("run_jobs", stdout=StringIO())
+        self.assertFalse(User.objects.filter(username="leaving").exists())
+        self.assertFalse(DeletedAuthor.objects.exists())
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(counts.global_count(), (1, True))
+        self.assertEqual(
+            BackgroundJob.objects.get().status, BackgroundJob.DONE
+        )
+
+
+@override_settings(
+    BACKGROUND_JOBS={"EAGER": True, "BATCH": 2},
+    POST_ARCHIVE={"DATABASE": "archive", "AGE_DAYS": 30},
+)
+class SoftDeleteArchiveTests(TestCase):
+    databases = {"default", "archive"}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username="leaving")
+        self.reader = User.objects.create_user(username="staying")
+        self.group = Group.objects.create(title="Старое", slug="old")
+        old_post = Post.objects.create(
+            text="Старый пост", author=self.author, group=self.group
+        )
+        reader_post = Post.objects.create(
+            text="Старый пост читателя", author=self.reader
+        )
+        Post.objects.update(
+            pub_date=timezone.now() - dt.timedelta(days=100)
+        )
+        Comment.objects.create(post=old_post, author=self.reader, text="Ну")
+        Comment.objects.create(
+            post=reader_post, author=self.author, text="Ухожу"
+        )
+        self.old_post = old_post
+        call_command("archive_posts", stdout=StringIO())
+        self.assertEqual(counts.author_count(self.reader).value, 1)
+
+    def test_purge_user_erases_archived_rows(self):
+        jobs.soft_delete_users(User.objects.filter(pk=self.author.pk))
+        archived = Post.objects.using("archive")
+        self.assertEqual(
+            list(archived.values_list("text", flat=True)),
+            ["Старый пост читателя"],
+        )
+        self.assertFalse(
+            Comment.objects.using("archive").filter(
+                author_id=self.author.pk
+            ).exists()
+        )
+        self.assertFalse(
+            Comment.objects.using("archive").filter(
+                post_id=self.old_post.pk
+            ).exists()
+        )
+        self.assertIsNone(feeds.find_post(self.old_post.pk))
+        # Архивный пост не входил в общую ленту: ее счетчик не сдвигается.
+        self.assertEqual(counts.global_count(), (0, True))
+        self.assertEqual(counts.author_count(self.reader), (1, True))
+
+    def test_purge_group_unlinks_archived_posts(self):
+        jobs.soft_delete_groups(Group.objects.filter(pk=self.group.pk))
+        self.assertFalse(Group.objects.exists())
+        self.assertIsNone(
+            Post.objects.using("archive").get(pk=self.old_post.pk).group_id
+        )
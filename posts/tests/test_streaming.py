@@ -0,0 +1,43 @@
+from django.test import override_settings
+
+from posts.tests.base import FeedTestCase
+
+
+@override_settings(FEED_STREAMING={"ENABLED": True, "BATCH": 2})
+class StreamingFeedTests(FeedTestCase):
+    author_name = "stream-author"
+    group_title = "Поток"
+    group_slug = "stream"
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.author)
+
+    def test_head_is_sent_before_feed_is_read(self):
+        response = self.client.get("/group/stream/")
+        self.assertTrue(response.streaming)
+        chunks = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            head = next(chunks).decode()
+        self.assertIn("bootstrap.min.css", head)
+        self.assertIn("<title>Записи сообщества Поток", head)
+        self.assertNotIn("<body>", head)
+
+    def test_streamed_page_is_complete(self):
+        response = self.client.get("/")
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        page = "".join(chunks)
+        for number in range(5):
+            self.assertIn(f"Пост {number}", page)
+        self.assertIn("Пользователь: stream-author.", page)
+        self.assertIn("/edit/", page)
+        self.assertNotIn("<!--stream:cards-->", page)
+        self.assertNotIn("<!--hole:", page)
+        self.assertTrue(page.rstrip().endswith("</html>"))
+        # <head>, начало тела, три пачки карточек и конец страницы.
+        self.assertEqual(len(chunks), 6)
+
+    def test_missing_group_is_404_before_streaming(self):
+        response = self.client.get("/group/missing/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.streaming)
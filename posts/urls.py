@@ -7,6 +7,7 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_url"),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("feed/cards/", views.feed_cards, name="feed_cards"),
     path(
         "<str:username>/follow/",
         views.profile_follow,
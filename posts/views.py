@@ -1,38 +1,142 @@
+import hashlib
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
 from django.urls import reverse
 
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         StreamingHttpResponse)
+from django.utils.cache import get_conditional_response, quote_etag
 
-from .models import Follow, Post, Group, User
+from . import counts, feeds
+from .cards import build_cards
+from .export import FORMATS, export
+from .feed_cache import cursor_cards, page_cards
+from .fragments import render_cards
+from .models import Follow, Group, User
 from .forms import PostForm, CommentForm
+from .group_commit import run_write
+from .holes import cache_shell
+from .paging import paginate
+from .streaming import render_feed
+
+
+FEED_CARDS_BATCH = 10
+
+
+def get_author_or_404(username):
+    """ Автор по имени; удаленные авторы не находятся. """
+    author = get_object_or_404(User, username=username)
+    if author.pk in feeds.hidden_authors():
+        raise Http404("Автор удален.")
+    return author
+
+
+def get_post_or_404(post_id, author=None):
+    """ Ищет пост в шарде автора или во всех шардах. """
+    post = feeds.find_post(post_id, author)
+    if post is None:
+        raise Http404("Пост не найден.")
+    return post
 
 
+@cache_shell
 def index(request):
     """
     Отображение главной страницы со всеми постами.
     Показывает 10 постов на странице. От самого свежего до самого старого.
     """
-    post_list = Post.objects.select_related("group")
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    context = {"page": page, "paginator": paginator}
-    return render(request, "index.html", context)
+    def build_context():
+        post_list = feeds.global_feed()
+        post_count = counts.global_count()
+        paginator, page = paginate(
+            post_list, request.GET.get("page"), count=post_count
+        )
+        cards = page_cards(page, "index")
+        return {
+            "page": page,
+            "cards": cards,
+            "paginator": paginator,
+            "post_count": post_count,
+        }
+    return render_feed(request, "index.html", build_context)
 
 
+@cache_shell
 def group_posts(request, slug):
     """
     Отображение страницы группы. Принцип отображения как у главной страницы.
     """
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    context = {"group": group, "page": page, "paginator": paginator}
-    return render(request, "group.html", context)
+    group = get_object_or_404(Group, slug=slug, is_deleted=False)
+
+    def build_context():
+        posts = feeds.group_feed(group)
+        post_count = counts.group_count(group)
+        paginator, page = paginate(
+            posts, request.GET.get("page"), count=post_count
+        )
+        cards = page_cards(page, f"group:{group.pk}")
+        return {
+            "page": page,
+            "cards": cards,
+            "paginator": paginator,
+            "post_count": post_count,
+        }
+    return render_feed(
+        request, "group.html", build_context, {"group": group}
+    )
+
+
+def scroll_feed(request, feed_id):
+    """
+    Лента по ее id ("index", "group:<slug>", "profile:<username>",
+    "follow") и имя ее кеша; у личной ленты подписок кеша нет.
+    """
+    kind, _, key = feed_id.partition(":")
+    if feed_id == "index":
+        return feeds.global_feed(), "index"
+    if kind == "group":
+        group = get_object_or_404(Group, slug=key, is_deleted=False)
+        return feeds.group_feed(group), f"group:{group.pk}"
+    if kind == "profile":
+        author = get_author_or_404(key)
+        return feeds.author_feed(author), f"profile:{author.pk}"
+    if feed_id == "follow":
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        return feeds.follow_feed(request.user), None
+    raise Http404("Нет такой ленты.")
+
+
+def feed_cards(request):
+    """
+    Следующие FEED_CARDS_BATCH карточек ленты для бесконечной прокрутки:
+    только HTML карточек, без шапки, меню и паджинатора. Курсор
+    следующей порции - в заголовке X-Next-Cursor (пустой в конце ленты).
+    """
+    feed, name = scroll_feed(request, request.GET.get("feed", "index"))
+    cursor = request.GET.get("cursor") or None
+    try:
+        posts = feeds.feed_after(feed, cursor)
+    except ValueError:
+        return HttpResponseBadRequest("Неверный курсор.")
+    cards = cursor_cards(posts, name, cursor, FEED_CARDS_BATCH)
+    next_cursor = ""
+    if len(cards) > FEED_CARDS_BATCH:
+        cards = cards[:FEED_CARDS_BATCH]
+        next_cursor = feeds.encode_cursor(cards[-1].pub_date, cards[-1].id)
+    etag = quote_etag(hashlib.md5(
+        " ".join([card.version for card in cards] + [next_cursor]).encode()
+        ).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(render_cards(cards))
+    response["ETag"] = etag
+    response["X-Next-Cursor"] = next_cursor
+    return response
 
 
 @login_required
@@ -43,7 +147,7 @@ def new_post(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        form.save()
+        run_write(form.save, write_for=new_post)
         return redirect("index")
     return render(request, "posts/new_post.html", context)
 
@@ -51,48 +155,44 @@ def new_post(request):
 @login_required
 def follow_index(request):
     """ Отображение всех постов авторов на которых подписан пользователь. """
-    posts = Post.objects.select_related(
-        "author"
-        ).filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    context = {"page": page, "paginator": paginator}
+    posts = feeds.follow_feed(request.user)
+    paginator, page = paginate(posts, request.GET.get("page"))
+    cards = build_cards(page.object_list)
+    context = {"page": page, "cards": cards, "paginator": paginator}
     return render(request, "posts/follow.html", context)
 
 
+@cache_shell
 def profile(request, username):
     """ Страница отображения профиля автора. Показывает все посты автора. """
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    followers_qty = author.following.count()
-    followed_qty = author.follower.count()
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-            ).exists()
-    posts_number = len(post_list)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    context = {
-        "posts_number": posts_number,
-        "page": page,
-        "author": author,
-        "followers_qty": followers_qty,
-        "followed_qty": followed_qty,
-        "following": following,
-        "paginatior": paginator,
-    }
-    return render(request, "posts/profile.html", context)
+    author = get_author_or_404(username)
+
+    def build_context():
+        post_list = feeds.author_feed(author)
+        post_count = counts.author_count(author)
+        paginator, page = paginate(
+            post_list, request.GET.get("page"), count=post_count
+        )
+        cards = page_cards(page, f"profile:{author.pk}")
+        return {
+            "posts_number": post_count.value,
+            "post_count": post_count,
+            "page": page,
+            "cards": cards,
+            "followers_qty": author.following.count(),
+            "followed_qty": author.follower.count(),
+            "paginatior": paginator,
+        }
+    return render_feed(
+        request, "posts/profile.html", build_context, {"author": author}
+    )
 
 
 @login_required
 def profile_follow(request, username):
     """ Подписывает на автора. """
     follower = get_object_or_404(User, username=request.user)
-    followed_author = get_object_or_404(User, username=username)
+    followed_author = get_author_or_404(username)
     followed_author_profile_url = reverse(
         "profile", kwargs={"username": followed_author}
     )
@@ -100,9 +200,11 @@ def profile_follow(request, username):
     if follower == followed_author:
         return redirect(followed_author_profile_url)
     # Если проверки пройдены, создаем новую запись.
-    Follow.objects.get_or_create(
+    run_write(
+        Follow.objects.get_or_create,
         user=follower,
         author=followed_author,
+        write_for=Follow,
     )
     return redirect(followed_author_profile_url)
 
@@ -111,38 +213,41 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """ Отписывает от автора. """
     follower = get_object_or_404(User, username=request.user)
-    followed_author = get_object_or_404(User, username=username)
+    followed_author = get_author_or_404(username)
     Follow.objects.filter(user=follower, author=followed_author).delete()
     return redirect(
         reverse("profile", kwargs={"username": followed_author})
     )
 
 
+@cache_shell
 def post_view(request, username, post_id):
     """
     Отображение страницы конкретного поста.
     Так же отображает все комментарии к нему.
     """
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id)
+    author = get_author_or_404(username)
+    post = get_post_or_404(post_id, author)
     followers_qty = author.following.count()
     followed_qty = author.follower.count()
-    posts_number = author.posts.count()
-    comments = post.comments.all()
+    post_count = counts.author_count(author)
+    comments = feeds.visible(post.comments.all())
     form = CommentForm(request.POST or None)
     if form.is_valid() and request.user.is_authenticated:
         comment = form.save(commit=False)
-        comment.post = Post.objects.get(id=post_id)
+        comment.post = post
         comment.author = request.user
-        form.save()
+        run_write(form.save, write_for=comment)
         return redirect(
             reverse("post", kwargs={"username": username, "post_id": post_id})
         )
     context = {
         "form": form,
-        "posts_number": posts_number,
+        "posts_number": post_count.value,
+        "post_count": post_count,
         "author": author,
         "post": post,
+        "card": build_cards([post], full=True)[0],
         "comments": comments,
         "followers_qty": followers_qty,
         "followed_qty": followed_qty,
@@ -156,7 +261,7 @@ def post_edit(request, username, post_id):
     Функция редактирования поста. Редактировать может только автор поста.
     Использует шаблон new_post.html.
     """
-    sel_post = get_object_or_404(Post, id=post_id)
+    sel_post = get_post_or_404(post_id)
     sel_post_author = sel_post.author
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=sel_post
@@ -180,26 +285,28 @@ def post_edit(request, username, post_id):
 @login_required
 def add_comment(request, username, post_id):
     """ Отображение страницы страницы создания комментария к посту. """
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id)
+    author = get_author_or_404(username)
+    post = get_post_or_404(post_id, author)
     followers_qty = author.following.count()
     followed_qty = author.follower.count()
-    posts_number = author.posts.count()
-    comments = post.comments.all()
+    post_count = counts.author_count(author)
+    comments = feeds.visible(post.comments.all())
     form = CommentForm(request.POST or None)
     if form.is_valid() and request.user.is_authenticated:
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        form.save()
+        run_write(form.save, write_for=comment)
         return redirect(
             reverse("post", kwargs={"username": username, "post_id": post_id})
         )
     context = {
         "form": form,
-        "posts_number": posts_number,
+        "posts_number": post_count.value,
+        "post_count": post_count,
         "author": author,
         "post": post,
+        "card": build_cards([post], full=True)[0],
         "comments": comments,
         "followers_qty": followers_qty,
         "followed_qty": followed_qty,
@@ -207,6 +314,27 @@ def add_comment(request, username, post_id):
     return render(request, "posts/post.html", context)
 
 
+@staff_member_required
+def export_table(request, kind):
+    """
+    Потоковая выгрузка таблицы для сотрудников, как команда export:
+    ?format=jsonl|csv, ?gzip=1 - сжатие на лету.
+    """
+    fmt = request.GET.get("format", "jsonl")
+    compress = bool(request.GET.get("gzip"))
+    try:
+        chunks = export(kind, fmt, compress)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    filename = f"{kind}.{fmt}.gz" if compress else f"{kind}.{fmt}"
+    response = StreamingHttpResponse(
+        chunks,
+        content_type="application/gzip" if compress else FORMATS[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 def page_not_found(request, exception):
     """ Отображение страницы, которая не была найдена. """
     return render(
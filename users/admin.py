@@ -0,0 +1,16 @@
+from django.contrib import admin
+# Импорт регистрирует стандартную админку пользователей: ее заменяем.
+from django.contrib.auth.admin import UserAdmin
+
+from posts.admin import SoftDeleteAdmin
+from posts.jobs import soft_delete_users
+
+from .forms import User
+
+
+class YatubeUserAdmin(SoftDeleteAdmin, UserAdmin):
+    soft_delete = staticmethod(soft_delete_users)
+
+
+admin.site.unregister(User)
+admin.site.register(User, YatubeUserAdmin)
@@ -0,0 +1,110 @@
+"""
+Архив данных пользователя (посты, изображения, комментарии, подписчики
+и подписки) в ZIP, который собирается по мере отправки.
+
+zipfile умеет писать в поток без seek(): размеры и контрольные суммы
+записываются после данных каждого файла. ZipStream собирает байты,
+которые zipfile успел записать, а генератор отдает их ответу. JSON-файлы
+пишутся построчно из порций строк posts.export.scan, изображения читаются
+из хранилища кусками, поэтому память не зависит от числа постов.
+"""
+import json
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.export import CHUNK_SIZE, EXPORTS, scan
+from posts.models import Comment, Follow, Post, User
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream:
+    """ Файл для zipfile без seek(): запись копится до take(). """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _usernames(user_ids):
+    return dict(
+        User.objects.filter(pk__in=user_ids).values_list("pk", "username")
+    )
+
+
+def user_archive(user, chunk_size=CHUNK_SIZE):
+    """ Байты ZIP-архива с данными пользователя. """
+    stream = ZipStream()
+    archive = zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED)
+
+    def write_json(name, chunks):
+        """ JSON-массив, который пишется в архив порциями. """
+        with archive.open(name, "w") as file:
+            file.write(b"[")
+            first = True
+            for chunk in chunks:
+                for row in chunk:
+                    file.write(b"\n" if first else b",\n")
+                    file.write(json.dumps(
+                        row, cls=DjangoJSONEncoder, ensure_ascii=False
+                    ).encode())
+                    first = False
+            file.write(b"\n]\n")
+
+    def followers(field, other):
+        """ Подписки пользователя с именами второй стороны. """
+        for chunk in scan(Follow, ("id", other), chunk_size,
+                          **{field: user.pk}):
+            names = _usernames(row[other] for row in chunk)
+            yield [{"username": names.get(row[other])} for row in chunk]
+
+    write_json("profile.json", [[{
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "date_joined": user.date_joined,
+    }]])
+    yield stream.take()
+    for name, chunks in (
+        ("posts.json",
+         scan(Post, EXPORTS["post"][1], chunk_size, author_id=user.pk)),
+        ("comments.json",
+         scan(Comment, EXPORTS["comment"][1], chunk_size,
+              author_id=user.pk)),
+        ("followers.json", followers("author_id", "user_id")),
+        ("following.json", followers("user_id", "author_id")),
+    ):
+        write_json(name, chunks)
+        yield stream.take()
+    # Изображения уже сжаты, поэтому кладутся в архив без сжатия.
+    images = scan(
+        Post, ("id", "image"), chunk_size, author_id=user.pk, image__gt=""
+    )
+    for chunk in images:
+        for row in chunk:
+            if not default_storage.exists(row["image"]):
+                continue
+            info = zipfile.ZipInfo(row["image"])
+            info.compress_type = zipfile.ZIP_STORED
+            with default_storage.open(row["image"], "rb") as source, \
+                    archive.open(info, "w") as target:
+                for data in iter(
+                        lambda: source.read(FILE_CHUNK_SIZE), b""):
+                    target.write(data)
+                    yield stream.take()
+    archive.close()
+    yield stream.take()
@@ -0,0 +1,77 @@
+"""
+Загрузка пользователя текущего запроса через кеш.
+
+Стандартный AuthenticationMiddleware на каждый запрос читает пользователя
+из auth_user. Здесь пользователь берется из кеша по id и читается из базы
+только при промахе. Запись сбрасывается при сохранении и удалении
+пользователя (см. users.signals).
+
+Хеш пароля в кеш не попадает: вместо него хранится хеш сессии
+(get_session_auth_hash), а пароль у пользователя из кеша - отложенное
+поле, которое при обращении читается из базы.
+"""
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model,
+    load_backend,
+)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import router
+from django.utils.crypto import constant_time_compare
+
+USER_CACHE_KEY = "auth-user:{}"
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id)
+
+
+def _cached_fields(user):
+    """ Поля пользователя для кеша: все, кроме хеша пароля. """
+    return {
+        "fields": {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname != "password"
+        },
+        "session_hash": user.get_session_auth_hash(),
+    }
+
+
+def _from_cache(entry):
+    model = get_user_model()
+    fields = entry["fields"]
+    return model.from_db(
+        router.db_for_read(model), list(fields), list(fields.values())
+    )
+
+
+def get_cached_user(request):
+    """ Аналог django.contrib.auth.get_user с кешем пользователей. """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(
+            request.session[SESSION_KEY]
+        )
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = user_cache_key(user_id)
+    entry = cache.get(key)
+    if entry is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        entry = _cached_fields(user)
+        cache.set(key, entry, settings.USER_CACHE_TIMEOUT)
+    else:
+        user = _from_cache(entry)
+    # Смена пароля обесценивает старые сессии, как и в django.contrib.auth.
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+            session_hash, entry["session_hash"])):
+        request.session.flush()
+        return AnonymousUser()
+    return user
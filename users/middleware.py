@@ -0,0 +1,14 @@
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from .auth import get_cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Замена AuthenticationMiddleware, которая берет пользователя
+    из кеша, а не из базы.
+    """
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+from users.archive import FILE_CHUNK_SIZE, user_archive
+from users.auth import get_cached_user, user_cache_key
+from users.forms import User
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="test-reader", password="testsneverfail"
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.session_key = self.client.session.session_key
+
+    def make_request(self):
+        request = RequestFactory().get("/")
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(self.session_key)
+        return request
+
+    def test_identity_needs_no_queries_after_warm_up(self):
+        """
+        Повторная загрузка сессии и пользователя не обращается к базе.
+        """
+        get_cached_user(self.make_request())
+        with self.assertNumQueries(0):
+            user = get_cached_user(self.make_request())
+        self.assertEqual(user, self.user)
+
+    def test_password_hash_is_not_cached(self):
+        """
+        В кеше нет хеша пароля, а пароль пользователя из кеша
+        дочитывается из базы.
+        """
+        get_cached_user(self.make_request())
+        self.assertNotIn(
+            self.user.password, str(cache.get(user_cache_key(self.user.pk)))
+        )
+        user = get_cached_user(self.make_request())
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertTrue(user.check_password("testsneverfail"))
+
+    def test_user_save_invalidates_cache(self):
+        """ Сохранение пользователя сбрасывает его запись в кеше. """
+        get_cached_user(self.make_request())
+        self.user.first_name = "Test"
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(
+            get_cached_user(self.make_request()).first_name, "Test"
+        )
+
+    def test_password_change_logs_out_other_sessions(self):
+        """ После смены пароля старая сессия больше не авторизует. """
+        get_cached_user(self.make_request())
+        self.user.set_password("anotherpassword")
+        self.user.save()
+        self.assertFalse(
+            get_cached_user(self.make_request()).is_authenticated
+        )
+
+
+class UserArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username="archive-author")
+        self.other = User.objects.create_user(username="archive-reader")
+        self.image = os.urandom(3 * FILE_CHUNK_SIZE)
+        path = default_storage.save("posts/big.bin", ContentFile(self.image))
+        self.posts = [
+            Post.objects.create(text=f"Пост {number}", author=self.user)
+            for number in range(5)
+        ]
+        Post.objects.filter(pk=self.posts[0].pk).update(image=path)
+        Post.objects.create(text="Чужой пост", author=self.other)
+        Comment.objects.create(
+            post=self.posts[1], author=self.user, text="Свой комментарий"
+        )
+        Follow.objects.create(user=self.other, author=self.user)
+
+    def test_archive_contents(self):
+        data = b"".join(user_archive(self.user, chunk_size=2))
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertIsNone(archive.testzip())
+        posts = json.loads(archive.read("posts.json"))
+        self.assertEqual(
+            [post["text"] for post in posts],
+            [f"Пост {number}" for number in range(5)],
+        )
+        comments = json.loads(archive.read("comments.json"))
+        self.assertEqual(comments[0]["text"], "Свой комментарий")
+        self.assertEqual(
+            json.loads(archive.read("followers.json")),
+            [{"username": "archive-reader"}],
+        )
+        self.assertEqual(json.loads(archive.read("following.json")), [])
+        self.assertEqual(archive.read(posts[0]["image"]), self.image)
+
+    def test_image_is_streamed_in_chunks(self):
+        """ Ни одна часть ответа не больше куска чтения файла. """
+        sizes = [len(chunk) for chunk in user_archive(self.user)]
+        self.assertGreater(sum(sizes), len(self.image))
+        self.assertLessEqual(max(sizes), FILE_CHUNK_SIZE + 1024)
+
+    def test_view_requires_login(self):
+        url = reverse("data_export")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archive = zipfile.ZipFile(
+            io.BytesIO(b"".join(response.streaming_content))
+        )
+        self.assertIn("profile.json", archive.namelist())
@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path("signup/", views.SignUp.as_view(), name="signup"),
+    path("export/", views.data_export, name="data_export"),
 ]
@@ -1,6 +1,9 @@
+from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 
+from .archive import user_archive
 from .forms import CreationForm
 
 
@@ -8,3 +11,15 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy("signup")
     template_name = "users/signup.html"
+
+
+@login_required
+def data_export(request):
+    """ ZIP-архив с данными пользователя, который собирается на лету. """
+    response = StreamingHttpResponse(
+        user_archive(request.user), content_type="application/zip"
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{request.user.username}.zip"'
+    )
+    return response
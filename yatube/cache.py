@@ -0,0 +1,337 @@
+"""
+Двухуровневый кеш без внешних сервисов.
+
+L1 - ограниченный LRU в памяти процесса, общий для всех его потоков.
+L2 - файл SQLite, общий для всех воркеров на машине.
+
+Каждая запись в L2 получает возрастающую метку и оставляет след в журнале
+изменений. Перед чтением (не чаще раза в COHERENCE_INTERVAL секунд) процесс
+просматривает журнал с последней увиденной метки и выбрасывает из L1
+ключи, измененные другими процессами. Так сброс кеша в одном воркере
+доходит до всех остальных.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# L1 общий для всех потоков процесса: Django создает свой экземпляр
+# бэкенда в каждом потоке.
+_l1_caches = {}
+_l1_locks = {}
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache_entries ("
+    " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+    " expires REAL, stamp INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS cache_changes ("
+    " stamp INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT)",
+)
+
+
+class _Level1:
+    """ Состояние L1 одного процесса. """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.seen_stamp = None
+        self.checked_at = 0.0
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._l1_max_entries = options.get("L1_MAX_ENTRIES", 1000)
+        self._interval = options.get("COHERENCE_INTERVAL", 0.05)
+        self._journal_size = options.get("JOURNAL_SIZE", 10000)
+        self._l1 = _l1_caches.setdefault(location, _Level1())
+        self._lock = _l1_locks.setdefault(location, threading.RLock())
+        self._local = threading.local()
+
+    # L2: файл SQLite.
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    def _write(self, key, value=None, expires=None, only_missing=False):
+        """
+        Записывает (или удаляет при value=None) ключ в L2 и журнал.
+        Возвращает метку записи или None, если only_missing и ключ жив.
+        """
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if only_missing:
+                row = db.execute(
+                    "SELECT expires FROM cache_entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    db.execute("COMMIT")
+                    return None
+            stamp = db.execute(
+                "INSERT INTO cache_changes (key) VALUES (?)", (key,)
+            ).lastrowid
+            if value is None:
+                db.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache_entries "
+                    "(key, value, expires, stamp) VALUES (?, ?, ?, ?)",
+                    (key, value, expires, stamp),
+                )
+            if stamp % 1000 == 0:
+                self._prune(db, stamp)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return stamp
+
+    def _prune(self, db, stamp):
+        """ Чистит просроченные записи и старый хвост журнала. """
+        db.execute(
+            "DELETE FROM cache_entries WHERE expires IS NOT NULL "
+            "AND expires < ?", (time.time(),)
+        )
+        db.execute(
+            "DELETE FROM cache_changes WHERE stamp <= ?",
+            (stamp - self._journal_size,),
+        )
+
+    @staticmethod
+    def _expired(expires):
+        return expires is not None and expires <= time.time()
+
+    # L1: LRU в памяти процесса.
+
+    def _sync(self):
+        """ Выбрасывает из L1 ключи, измененные другими процессами. """
+        now = time.monotonic()
+        l1 = self._l1
+        seen_stamp = l1.seen_stamp
+        if seen_stamp is not None and now - l1.checked_at < self._interval:
+            return
+        if seen_stamp is None:
+            rows = []
+            top = self._db.execute(
+                "SELECT COALESCE(MAX(stamp), 0) FROM cache_changes"
+            ).fetchone()[0]
+        else:
+            rows = self._db.execute(
+                "SELECT stamp, key FROM cache_changes WHERE stamp > ? "
+                "ORDER BY stamp", (seen_stamp,)
+            ).fetchall()
+            top = rows[-1][0] if rows else seen_stamp
+        with self._lock:
+            # Метки идут подряд. Разрыв значит, что журнал обрезан дальше
+            # увиденного, и содержимое L1 проверить уже нельзя.
+            if seen_stamp is None or (rows and rows[0][0] > seen_stamp + 1):
+                l1.entries.clear()
+            for stamp, key in rows:
+                if key is None:
+                    l1.entries.clear()
+                    continue
+                entry = l1.entries.get(key)
+                if entry is not None and entry[2] < stamp:
+                    del l1.entries[key]
+            l1.seen_stamp = max(top, l1.seen_stamp or 0)
+            l1.checked_at = now
+
+    def _seen(self):
+        """ Метка журнала, до которой L1 сверен; берется до обращения к L2. """
+        with self._lock:
+            return self._l1.seen_stamp
+
+    def _remember(self, key, value, expires, stamp, seen):
+        """
+        Кладет значение в L1, если с обращения к L2 журнал не сверялся.
+        Иначе другой поток мог уже пропустить более новое изменение ключа
+        (_sync), и старое значение в L1 никто бы не сбросил.
+        """
+        with self._lock:
+            if self._l1.seen_stamp != seen:
+                return
+            entries = self._l1.entries
+            entries[key] = (value, expires, stamp)
+            entries.move_to_end(key)
+            while len(entries) > self._l1_max_entries:
+                entries.popitem(last=False)
+
+    def _forget(self, key):
+        with self._lock:
+            self._l1.entries.pop(key, None)
+
+    def _lookup(self, key):
+        """ Возвращает сериализованное значение ключа или None. """
+        with self._lock:
+            entry = self._l1.entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._l1.entries.move_to_end(key)
+                    return entry[0]
+                del self._l1.entries[key]
+            seen = self._l1.seen_stamp
+        row = self._db.execute(
+            "SELECT value, expires, stamp FROM cache_entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        self._remember(key, row[0], row[1], row[2], seen)
+        return row[0]
+
+    # API кеша Django.
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self.get_backend_timeout(timeout)
+        seen = self._seen()
+        stamp = self._write(key, pickled, expires, only_missing=True)
+        if stamp is None:
+            return False
+        self._remember(key, pickled, expires, stamp, seen)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._sync()
+        pickled = self._lookup(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self.get_backend_timeout(timeout)
+        seen = self._seen()
+        stamp = self._write(key, pickled, expires)
+        self._remember(key, pickled, expires, stamp, seen)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._sync()
+        pickled = self._lookup(key)
+        if pickled is None:
+            return False
+        expires = self.get_backend_timeout(timeout)
+        seen = self._seen()
+        stamp = self._write(key, pickled, expires)
+        self._remember(key, pickled, expires, stamp, seen)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._forget(key)
+        self._write(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._sync()
+        return self._lookup(key) is not None
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            full_key = self.make_key(key, version=version)
+            self.validate_key(full_key)
+            with self._lock:
+                entry = self._l1.entries.get(full_key)
+            if entry is not None and not self._expired(entry[1]):
+                found[key] = pickle.loads(entry[0])
+            else:
+                missing[full_key] = key
+        # Промахи L1 добираются из L2 одним запросом.
+        seen = self._seen()
+        full_keys = list(missing)
+        for start in range(0, len(full_keys), 500):
+            chunk = full_keys[start:start + 500]
+            rows = self._db.execute(
+                "SELECT key, value, expires, stamp FROM cache_entries "
+                "WHERE key IN ({})".format(", ".join("?" * len(chunk))),
+                chunk,
+            ).fetchall()
+            for full_key, value, expires, stamp in rows:
+                if self._expired(expires):
+                    continue
+                self._remember(full_key, value, expires, stamp, seen)
+                found[missing[full_key]] = pickle.loads(value)
+        return found
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_key(key, version=version)
+        self.validate_key(full_key)
+        seen = self._seen()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT value, expires FROM cache_entries WHERE key = ?",
+                (full_key,),
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            new_value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            stamp = db.execute(
+                "INSERT INTO cache_changes (key) VALUES (?)", (full_key,)
+            ).lastrowid
+            db.execute(
+                "UPDATE cache_entries SET value = ?, stamp = ? WHERE key = ?",
+                (pickled, stamp, full_key),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._remember(full_key, pickled, row[1], stamp, seen)
+        return new_value
+
+    def clear(self):
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM cache_entries")
+            db.execute("INSERT INTO cache_changes (key) VALUES (NULL)")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._l1.entries.clear()
+
+    def close(self, **kwargs):
+        # Соединение с файлом живет вместе с потоком.
+        pass
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     "posts",
     "users",
     "about",
+    "api",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -50,12 +51,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "posts.middleware.PrimaryPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "posts.holes.HolePunchMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
@@ -66,8 +69,16 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Шаблоны компилируются один раз на процесс и при DEBUG тоже:
+            # иначе карточка поста заново читается и разбирается с диска
+            # для каждого поста ленты. После правки шаблона нужен перезапуск.
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "posts.context_processors.year",
                 "django.template.context_processors.debug",
@@ -92,6 +103,62 @@ DATABASES = {
     }
 }
 
+# Отдельные файлы SQLite для сессий, подписок и комментариев:
+# у каждого файла своя блокировка записи, и писатели разных подсистем
+# не мешают друг другу. После включения создайте таблицы в каждой базе:
+# python manage.py migrate --database <псевдоним>
+SPLIT_DATABASES = False
+
+DATABASE_SUBSYSTEMS = {
+    "sessions.session": "sessions",
+    "posts.follow": "social",
+    "posts.comment": "comments",
+}
+
+if SPLIT_DATABASES:
+    for alias in set(DATABASE_SUBSYSTEMS.values()):
+        DATABASES[alias] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(BASE_DIR, f"db_{alias}.sqlite3"),
+        }
+
+# Шардирование постов и комментариев по автору: псевдонимы баз шардов
+# из DATABASES. Пустой список - все посты в основной базе. Перенос автора
+# в другой шард: python manage.py move_author_shard <username> <псевдоним>
+POST_SHARDS = []
+
+DATABASE_ROUTERS = [
+    "posts.routers.ArchiveRouter",
+    "posts.routers.ReplicaRouter",
+    "posts.routers.ShardRouter",
+    "posts.routers.SubsystemRouter",
+]
+
+# Холодный архив: посты старше AGE_DAYS дней вместе с комментариями
+# переносит в базу DATABASE команда archive_posts (например, по cron).
+# DATABASE = None - архива нет. После включения (DATABASE = "archive")
+# создайте таблицы: python manage.py migrate --database archive
+# AGE_DAYS можно уменьшать, но не увеличивать: профиль не читает архив,
+# пока горячие посты страницы моложе AGE_DAYS дней.
+POST_ARCHIVE = {
+    "DATABASE": None,
+    "AGE_DAYS": 365,
+}
+
+if POST_ARCHIVE["DATABASE"]:
+    DATABASES[POST_ARCHIVE["DATABASE"]] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db_archive.sqlite3"),
+    }
+
+# Псевдонимы реплик из DATABASES, с которых читаются ленты и профили.
+# Например, снимок основной базы: python manage.py snapshot_replica replica
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи пользователь читает только из основной базы.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = "primary_pin"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +205,10 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Сессии и пользователи запроса читаются из кеша, база - только при промахе.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+USER_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 LOGOUT_REDIRECT_URL = "index"
@@ -147,8 +218,84 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 
+# Двухуровневый кеш: LRU в памяти процесса (L1) и общий для всех воркеров
+# файл SQLite (L2). COHERENCE_INTERVAL - как часто, в секундах, процесс
+# сверяет свой L1 с журналом изменений L2.
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    "default": {
+        "BACKEND": "yatube.cache.TieredCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache.sqlite3"),
+        "OPTIONS": {
+            "L1_MAX_ENTRIES": 1000,
+            "COHERENCE_INTERVAL": 0.05,
+        },
     }
 }
+
+# Тесты пишут кеш во временный файл, а не в cache.sqlite3 сервера.
+TEST_RUNNER = "yatube.testing.TestRunner"
+
+
+# Групповая фиксация мелких записей (комментарии, подписки, новые посты).
+# Записи из параллельных запросов собираются в одну транзакцию,
+# окно сбора - MAX_DELAY секунд, но не больше MAX_BATCH записей.
+GROUP_COMMIT = {
+    "ENABLED": False,
+    "MAX_DELAY": 0.005,
+    "MAX_BATCH": 100,
+}
+
+# Кеш лент: запись свежая TIMEOUT секунд, затем еще GRACE секунд
+# отдается устаревшая копия, пока один запрос пересчитывает ленту.
+# LOCK_TIMEOUT - сколько ждать чужого пересчета при полном промахе.
+FEED_CACHE = {
+    "TIMEOUT": 20,
+    "GRACE": 60,
+    "LOCK_TIMEOUT": 10,
+    "POLL_INTERVAL": 0.05,
+}
+
+# Готовый HTML карточки поста. Ключ зависит от содержимого карточки,
+# поэтому запись не нужно сбрасывать: после правки у поста новый ключ.
+POST_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Кеш каркасов страниц, общий для всех пользователей: персональные части
+# страницы заполняются после кеша (см. posts.holes). Выключен по умолчанию,
+# так как из кеша не восстановить контекст шаблона для тестов.
+SHELL_CACHE = {
+    "ENABLED": False,
+    "TIMEOUT": 20,
+}
+
+# Длина начала поста (в символах), которое показывается в карточке ленты.
+POST_EXCERPT_LENGTH = 500
+
+# Ссылки паджинатора: ENDS первых и последних страниц и WINDOW страниц
+# вокруг текущей. EXACT_COUNT = False - не считать число постов в ленте,
+# а только проверять, есть ли следующая страница (см. posts.paging).
+PAGINATION = {
+    "WINDOW": 2,
+    "ENDS": 1,
+    "EXACT_COUNT": True,
+}
+
+# Ленты до EXACT_LIMIT постов без счетчика считаются точно, а большие
+# показывают оценку по статистике SQLite (см. posts.counts).
+FEED_COUNTS = {
+    "EXACT_LIMIT": 100000,
+}
+
+# Потоковая отдача лент: <head> уходит сразу, карточки - пачками по BATCH.
+# Из потокового ответа тестовый клиент не получает контекст шаблона,
+# поэтому по умолчанию выключена.
+FEED_STREAMING = {
+    "ENABLED": False,
+    "BATCH": 5,
+}
+
+# Фоновые задачи админки (posts.jobs): строки обрабатываются пачками
+# по BATCH. С EAGER задача выполняется сразу в запросе, иначе - в потоке.
+BACKGROUND_JOBS = {
+    "EAGER": False,
+    "BATCH": 1000,
+}
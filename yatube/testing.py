@@ -0,0 +1,78 @@
+"""
+Окружение тестов: кеш во временном файле и базы выключенных подсистем.
+
+Тесты чистят кеш (cache.clear()) и пишут в него. С настройками сайта
+это был бы тот же файл cache.sqlite3, что и у сервера разработки:
+прогон тестов стирал бы его кеш и спорил бы с ним за блокировку.
+
+Архива (POST_ARCHIVE), реплик (DATABASE_REPLICAS) и шардов (POST_SHARDS)
+в настройках сайта нет, как и их баз в DATABASES. Тесты включают их
+через override_settings, поэтому прогон добавляет базы в памяти.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TemporaryCache:
+    """ Подменяет файл L2 кеша временным на время тестов. """
+
+    def enable(self):
+        self.directory = tempfile.mkdtemp(prefix="yatube-cache-")
+        caches = {
+            alias: {
+                **options,
+                "LOCATION": os.path.join(self.directory, f"{alias}.sqlite3"),
+            }
+            for alias, options in settings.CACHES.items()
+        }
+        self.override = override_settings(CACHES=caches)
+        self.override.enable()
+
+    def disable(self):
+        self.override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TestDatabases:
+    """
+    Добавляет в DATABASES базы в памяти, которых нет в настройках сайта.
+    Словарь меняется на месте: это тот же словарь, из которого
+    django.db.connections берет описания баз.
+    """
+    aliases = ("archive", "replica", "shard0", "shard1")
+
+    def enable(self):
+        self.added = [
+            alias for alias in self.aliases
+            if alias not in settings.DATABASES
+        ]
+        for alias in self.added:
+            settings.DATABASES[alias] = {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": ":memory:",
+            }
+
+    def disable(self):
+        for alias in self.added:
+            del settings.DATABASES[alias]
+
+
+class TestRunner(DiscoverRunner):
+    """ manage.py test с кешем во временном файле и базами в памяти. """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.temporary_cache = TemporaryCache()
+        self.temporary_cache.enable()
+        self.test_databases = TestDatabases()
+        self.test_databases.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_databases.disable()
+        self.temporary_cache.disable()
+        super().teardown_test_environment(**kwargs)
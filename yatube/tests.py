@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from os import path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from yatube.cache import TieredCache, _Level1
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, "cache.sqlite3")
+        self.worker = self.make_worker()
+        # Второй экземпляр со своим L1 изображает другой процесс.
+        self.other_worker = self.make_worker()
+        self.other_worker._l1 = _Level1()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_worker(self):
+        return TieredCache(self.location, {
+            "OPTIONS": {"L1_MAX_ENTRIES": 3, "COHERENCE_INTERVAL": 0},
+        })
+
+    def test_value_is_shared_between_workers(self):
+        """ Значение, записанное одним воркером, видно другому. """
+        self.worker.set("feed", [1, 2, 3])
+        self.assertEqual(self.other_worker.get("feed"), [1, 2, 3])
+
+    def test_invalidation_reaches_other_workers(self):
+        """ Перезапись и удаление ключа вытесняют его из чужого L1. """
+        self.worker.set("feed", "old")
+        self.assertEqual(self.other_worker.get("feed"), "old")
+        self.worker.set("feed", "new")
+        self.assertEqual(self.other_worker.get("feed"), "new")
+        self.worker.delete("feed")
+        self.assertIsNone(self.other_worker.get("feed"))
+
+    def test_clear_reaches_other_workers(self):
+        self.worker.set("feed", "old")
+        self.other_worker.get("feed")
+        self.worker.clear()
+        self.assertIsNone(self.other_worker.get("feed"))
+
+    def test_l1_is_bounded(self):
+        """ L1 хранит не больше L1_MAX_ENTRIES ключей, L2 - все. """
+        for number in range(5):
+            self.worker.set(f"key-{number}", number)
+        self.assertEqual(len(self.worker._l1.entries), 3)
+        self.assertEqual(
+            self.worker.get_many([f"key-{number}" for number in range(5)]),
+            {f"key-{number}": number for number in range(5)},
+        )
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.worker.add("counter", 1))
+        self.assertFalse(self.other_worker.add("counter", 5))
+        self.assertEqual(self.other_worker.incr("counter", 2), 3)
+        self.assertEqual(self.worker.get("counter"), 3)
+        with self.assertRaises(ValueError):
+            self.worker.incr("missing")
+
+    def test_expired_value_is_not_returned(self):
+        self.worker.set("feed", "value", timeout=0)
+        self.assertIsNone(self.worker.get("feed"))
+        self.assertFalse(self.worker.has_key("feed"))
+
+    def test_stale_read_is_not_remembered(self):
+        """
+        Значение, прочитанное из L2 до чужой перезаписи, не остается
+        в L1, если журнал успел свериться во время чтения.
+        """
+        self.worker.set("feed", "old")
+        self.worker._forget("feed")
+        remember = TieredCache._remember
+        raced = []
+
+        def overwrite_then_remember(cache, *args):
+            if not raced:
+                raced.append(True)
+                # Пока поток читал L2, другой процесс перезаписал ключ,
+                # а другой поток этого процесса сверил журнал.
+                self.other_worker.set("feed", "new")
+                self.make_worker()._sync()
+            remember(cache, *args)
+
+        with mock.patch.object(
+            TieredCache, "_remember", autospec=True,
+            side_effect=overwrite_then_remember,
+        ):
+            self.assertEqual(self.worker.get("feed"), "old")
+        self.assertEqual(self.worker.get("feed"), "new")